@@ -59,6 +59,43 @@ DATABASES = {
     }
 }
 
+# Кэш (результаты определителя и данные каталога)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mushroom-site',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    # Версия каталога (mushrooms/cache.py) общая для всех процессов: сервера
+    # и команд управления, которые меняют данные в обход его сигналов
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        # incr() перезаписывает ключ с таймаутом по умолчанию, а версия не должна истекать
+        'TIMEOUT': None,
+    },
+}
+
+# Время жизни закэшированных результатов определителя, секунды
+IDENTIFIER_CACHE_TIMEOUT = 60 * 60
+
+# Время жизни закэшированных страниц каталога, секунды;
+# страницы сбрасываются раньше при смене версии каталога
+PAGE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Сколько похожих грибов показывать на странице гриба
+SIMILAR_MUSHROOMS_COUNT = 4
+
+# Веса характеристик в ранжировании определителя: совпадение по важной
+# характеристике весит больше, несовпадение по ней штрафуется
+IDENTIFIER_WEIGHTS = {
+    'regular': 1.0,
+    'important': 2.0,
+    'important_mismatch_penalty': 1.0,
+}
+
 # Статические файлы (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
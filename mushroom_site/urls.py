@@ -1,7 +1,9 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from mushrooms.views import media_file
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -9,4 +11,9 @@ urlpatterns = [
 ]
 
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Как и django.conf.urls.static.static, медиафайлы отдаются только в режиме отладки;
+# файлы с хешем в имени получают заголовок Cache-Control: immutable
+if settings.DEBUG:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media_file),
+    ]
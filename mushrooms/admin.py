@@ -1,10 +1,14 @@
 import csv
 import openpyxl
 from django.http import HttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils import timezone
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.html import format_html
-from .models import Mushroom, Quiz, QuizQuestion, QuizAnswer, QuizResult, Characteristic, CharacteristicOption, MushroomCharacteristic, Lookalike, UserAnswer
+from .duplicates import DEFAULT_DISTANCE, HASH_KINDS, duplicate_clusters
+from .models import District, Mushroom, PhotoVariant, StoredFile, Quiz, QuizQuestion, QuizAnswer, QuizResult, Characteristic, CharacteristicOption, MushroomCharacteristic, Lookalike, UserAnswer
 
 class QuizAnswerInline(admin.TabularInline):
     """Встроенное редактирование ответов в вопросах"""
@@ -26,6 +30,15 @@ class LookalikeInline(admin.TabularInline):
     extra = 1
     autocomplete_fields = ['lookalike']
 
+class PhotoVariantInline(admin.TabularInline):
+    """Уменьшенные копии фотографии, создаются автоматически"""
+    model = PhotoVariant
+    extra = 0
+    max_num = 0
+    can_delete = False
+    fields = ['preset', 'format', 'width', 'height', 'size', 'file']
+    readonly_fields = fields
+
 class CharacteristicOptionInline(admin.TabularInline):
     """Встроенное редактирование вариантов характеристик"""
     model = CharacteristicOption
@@ -66,17 +79,19 @@ class UserAnswerInline(admin.TabularInline):
 @admin.register(Mushroom)
 class MushroomAdmin(admin.ModelAdmin):
     list_display = ['russian_name', 'latin_name', 'mushroom_type', 'edibility', 'season', 'get_lookalikes_count']
-    list_filter = ['mushroom_type', 'edibility', 'season']
+    list_filter = ['mushroom_type', 'edibility', 'season', 'districts']
     search_fields = ['russian_name', 'latin_name', 'description']
     list_per_page = 20
-    inlines = [MushroomCharacteristicInline, LookalikeInline]
+    inlines = [MushroomCharacteristicInline, LookalikeInline, PhotoVariantInline]
+    # Районы заполняются из поля «Распространение» при сохранении
+    readonly_fields = ['get_districts']
     
     fieldsets = (
         ('Основная информация', {
             'fields': ('russian_name', 'latin_name', 'mushroom_type', 'edibility')
         }),
         ('Описание', {
-            'fields': ('description', 'habitat', 'season', 'distribution')
+            'fields': ('description', 'habitat', 'season', 'distribution', 'get_districts')
         }),
         ('Дополнительная информация', {
             'fields': ('key_characteristics', 'warning', 'cooking_tips'),
@@ -92,6 +107,65 @@ class MushroomAdmin(admin.ModelAdmin):
         return obj.main_mushroom_lookalikes.count()
     get_lookalikes_count.short_description = 'Двойников'
 
+    def get_districts(self, obj):
+        return ', '.join(district.name for district in obj.districts.all()) or '—'
+    get_districts.short_description = 'Районы'
+
+    def get_urls(self):
+        urls = [
+            path('photo-duplicates/', self.admin_site.admin_view(self.photo_duplicates_view),
+                 name='mushrooms_mushroom_photo_duplicates'),
+        ]
+        return urls + super().get_urls()
+
+    def photo_duplicates_view(self, request):
+        """Группы грибов с похожими фотографиями по хешам, посчитанным find_duplicate_photos"""
+        kind = request.GET.get('hash')
+        if kind not in HASH_KINDS:
+            kind = 'phash'
+        try:
+            distance = min(max(int(request.GET.get('distance', DEFAULT_DISTANCE)), 0), 16)
+        except ValueError:
+            distance = DEFAULT_DISTANCE
+        with_photo = Mushroom.objects.exclude(photo='').exclude(photo__isnull=True)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Похожие фотографии',
+            'clusters': duplicate_clusters(kind, distance),
+            'hash_kinds': HASH_KINDS,
+            'kind': kind,
+            'distance': distance,
+            'pending_count': with_photo.filter(photo_phash='').count(),
+        }
+        return TemplateResponse(request, 'admin/mushrooms/mushroom/photo_duplicates.html', context)
+
+@admin.register(District)
+class DistrictAdmin(admin.ModelAdmin):
+    list_display = ['name', 'kind', 'get_mushrooms_count']
+    list_filter = ['kind']
+    search_fields = ['name']
+    readonly_fields = ['key']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(mushrooms_count=Count('mushrooms'))
+
+    def get_mushrooms_count(self, obj):
+        return obj.mushrooms_count
+    get_mushrooms_count.short_description = 'Грибов'
+    get_mushrooms_count.admin_order_field = 'mushrooms_count'
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    """Файлы фотографий с числом ссылок; удаляет их команда cleanup_photos"""
+    list_display = ['name', 'size', 'ref_count', 'created_at', 'released_at']
+    list_filter = ['ref_count']
+    search_fields = ['name']
+    readonly_fields = ['name', 'size', 'ref_count', 'created_at', 'released_at']
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
     list_display = ['name', 'level', 'questions_count', 'get_actual_questions_count', 'get_results_count']
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class MushroomsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'mushrooms'
+
+    def ready(self):
+        # Подключаем обработчики сигналов для сброса кэшей определителя
+        from . import signals  # noqa: F401
+
+        # Скомпилированное дерево определителя читается один раз при запуске
+        from .decision_tree import load_tree
+        load_tree()
@@ -0,0 +1,119 @@
+"""Автодополнение названий грибов.
+
+Индекс - отсортированный список ключей (начало названия с каждого
+слова в нижнем регистре) с id грибов; поиск по префиксу делается
+бинарным поиском без обращения к БД. Кроме русского и латинского
+названий в индекс попадают транслитерации русского названия, чтобы
+«belyj» и «belyy» находили «Белый гриб». Индекс строится из снимка
+каталога и пересобирается при смене его версии.
+"""
+import threading
+from bisect import bisect_left
+
+from django.urls import reverse
+
+from .catalog import get_catalog_snapshot
+
+# Самая распространённая схема транслитерации (как в загранпаспорте)
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f',
+    'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': 'ie',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'iu', 'я': 'ia',
+}
+# Другие частые варианты написания тех же букв
+TRANSLIT_VARIANTS = [
+    {'й': 'y', 'х': 'h', 'ъ': '', 'ю': 'yu', 'я': 'ya'},
+    {'й': 'j', 'х': 'h', 'ц': 'c', 'ъ': '', 'ю': 'ju', 'я': 'ja', 'щ': 'sch'},
+]
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 20
+
+
+def normalize(text):
+    """Ключ сравнения: нижний регистр, «ё» как «е», одиночные пробелы"""
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def transliterations(text):
+    """Варианты записи русского текста латиницей"""
+    variants = []
+    for overrides in [{}] + TRANSLIT_VARIANTS:
+        table = dict(TRANSLIT, **overrides)
+        variant = ''.join(table.get(char, char) for char in text)
+        if variant not in variants:
+            variants.append(variant)
+    return variants
+
+
+def word_suffixes(text):
+    """Текст, начиная с каждого слова: «белый гриб» -> «белый гриб», «гриб»"""
+    words = text.split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class AutocompleteIndex:
+    """Отсортированные ключи названий для поиска по префиксу"""
+
+    def __init__(self, mushrooms, version=None):
+        self.version = version
+        self.entries = {}
+        pairs = set()
+        for mushroom in mushrooms:
+            self.entries[mushroom.id] = {
+                'id': mushroom.id,
+                'name': mushroom.russian_name,
+                'latin_name': mushroom.latin_name,
+                'edibility': mushroom.get_edibility_display(),
+                'url': reverse('mushroom_detail', args=[mushroom.id]),
+            }
+            russian = normalize(mushroom.russian_name)
+            names = [russian, normalize(mushroom.latin_name)] + transliterations(russian)
+            for name in names:
+                for key in word_suffixes(name):
+                    pairs.add((key, mushroom.id))
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.ids = [mushroom_id for _, mushroom_id in pairs]
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """Грибы, у которых одно из названий начинается с prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            mushroom_id = self.ids[position]
+            if mushroom_id not in seen:
+                seen.add(mushroom_id)
+                results.append(self.entries[mushroom_id])
+                if len(results) >= limit:
+                    break
+            position += 1
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_autocomplete_index():
+    """Индекс текущей версии каталога, при необходимости строит его"""
+    global _index
+    snapshot = get_catalog_snapshot()
+    index = _index
+    if index is None or index.version != snapshot.version:
+        with _index_lock:
+            if _index is None or _index.version != snapshot.version:
+                _index = AutocompleteIndex(snapshot.mushrooms, snapshot.version)
+            index = _index
+    return index
+
+
+def autocomplete(prefix, limit=DEFAULT_LIMIT):
+    """Подсказки названий; число результатов ограничено MAX_LIMIT"""
+    return get_autocomplete_index().complete(prefix, max(1, min(limit, MAX_LIMIT)))
@@ -0,0 +1,148 @@
+"""Кэширование данных каталога.
+
+Ключи кэша включают версию каталога, которая увеличивается при любом
+изменении грибов и характеристик (см. signals.py), поэтому устаревшие
+записи просто перестают запрашиваться. Сами записи живут в памяти
+процесса, а версия - в общем кэше 'shared': её увеличение из команды
+управления или другого процесса сервера видно всем.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from .seasons import current_month
+
+CATALOG_VERSION_KEY = 'mushrooms:catalog_version'
+IDENTIFIER_HITS_KEY = 'mushrooms:identifier:hits'
+IDENTIFIER_MISSES_KEY = 'mushrooms:identifier:misses'
+PAGE_HITS_KEY = 'mushrooms:page:hits'
+PAGE_MISSES_KEY = 'mushrooms:page:misses'
+
+
+def get_catalog_version():
+    """Текущая версия каталога"""
+    shared = caches['shared']
+    version = shared.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Начинаем с текущего времени, чтобы после очистки кэша
+        # не вернуться к уже использованным номерам версий
+        shared.add(CATALOG_VERSION_KEY, int(time.time()), None)
+        version = shared.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Увеличивает версию каталога после изменения данных"""
+    try:
+        return caches['shared'].incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+def catalog_changed():
+    """Сбрасывает кэши каталога после массового изменения данных.
+
+    bulk_create, bulk_update и update() не отправляют сигналы, поэтому
+    после них версия каталога увеличивается этой функцией - как и в
+    signals.py, после фиксации транзакции.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+def _increment(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def identifier_cache_key(selected_options, partial=False):
+    """Ключ результата определителя по отсортированному набору ответов"""
+    pairs = sorted(f'char_{char_id}={value}' for char_id, value in selected_options.items())
+    if partial:
+        pairs.append('match_mode=partial')
+    digest = hashlib.sha1('&'.join(pairs).encode('utf-8')).hexdigest()
+    return f'mushrooms:identifier:{get_catalog_version()}:{digest}'
+
+
+def get_identifier_results(selected_options, partial=False):
+    """Готовый список результатов из кэша или None"""
+    results = cache.get(identifier_cache_key(selected_options, partial))
+    _increment(IDENTIFIER_MISSES_KEY if results is None else IDENTIFIER_HITS_KEY)
+    return results
+
+
+def set_identifier_results(selected_options, partial, results):
+    """Сохраняет список результатов определителя"""
+    timeout = getattr(settings, 'IDENTIFIER_CACHE_TIMEOUT', 60 * 60)
+    cache.set(identifier_cache_key(selected_options, partial), results, timeout)
+
+
+def identifier_cache_stats():
+    """Счётчики попаданий и промахов кэша определителя"""
+    hits = cache.get(IDENTIFIER_HITS_KEY, 0)
+    misses = cache.get(IDENTIFIER_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else 0.0,
+        'catalog_version': get_catalog_version(),
+        'page_hits': cache.get(PAGE_HITS_KEY, 0),
+        'page_misses': cache.get(PAGE_MISSES_KEY, 0),
+    }
+
+
+def page_cache_key(request):
+    """Ключ страницы по пути, параметрам запроса, версии каталога и месяцу.
+
+    Месяц нужен главной и странице «плодоносят сейчас»: их содержимое
+    меняется с началом месяца без изменения данных.
+    """
+    digest = hashlib.sha1(request.get_full_path().encode('utf-8')).hexdigest()
+    return f'mushrooms:page:{get_catalog_version()}:{current_month()}:{digest}'
+
+
+def catalog_page_cache(view):
+    """Кэширует страницы каталога для анонимных посетителей.
+
+    Страница хранится до смены версии каталога, поэтому правки в админке
+    видны сразу. Авторизованные пользователи всегда получают свежий ответ.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        user = getattr(request, 'user', None)
+        if request.method not in ('GET', 'HEAD') or (user is not None and user.is_authenticated):
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            _increment(PAGE_HITS_KEY)
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'HIT'
+            return response
+
+        _increment(PAGE_MISSES_KEY)
+        response = view(request, *args, **kwargs)
+        # Ответы, которые ставят cookie (сессия, сообщения, CSRF), не кэшируются
+        sets_cookies = (
+            response.cookies
+            or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            or getattr(getattr(request, 'session', None), 'modified', False)
+        )
+        if response.status_code == 200 and not response.streaming and not sets_cookies:
+            timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 24 * 60 * 60)
+            cache.set(key, (response.content, response['Content-Type']), timeout)
+            response['X-Page-Cache'] = 'MISS'
+        return response
+
+    return wrapper
@@ -0,0 +1,126 @@
+"""Снимок каталога грибов для страниц со списками.
+
+Все грибы читаются одним запросом в порядке (название, id) и
+раскладываются в памяти по типу и съедобности. Страницы съедобных и
+ядовитых грибов и галерея берут списки из одного снимка, а при
+фильтре по району - из его подмножества (for_district). Снимок
+привязан к версии каталога (см. cache.py) и пересобирается после
+любого изменения данных.
+
+Грибы, плодоносящие в заданном месяце, выбираются по индексу
+season_months: побитовое условие индекс использовать не может, поэтому
+сначала читается небольшой набор различных масок (не больше 4096), а
+затем подходящие маски ищутся через IN.
+"""
+import threading
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_catalog_version
+from .models import Mushroom
+from .seasons import month_bit
+
+EDIBLE = ('edible', 'conditionally_edible')
+POISONOUS = ('poisonous', 'deadly')
+
+
+class CatalogSnapshot:
+    """Грибы каталога, разложенные по типу и съедобности"""
+
+    def __init__(self, mushrooms, version=None):
+        self.version = version
+        self.mushrooms = mushrooms
+        # Ключи сортировки галереи для поиска позиции курсора
+        self.keys = [(mushroom.russian_name, mushroom.id) for mushroom in mushrooms]
+        self.groups = {}
+        # Подмножества снимка по районам, строятся по запросу
+        self.districts = {}
+        for mushroom in mushrooms:
+            self.groups.setdefault((mushroom.mushroom_type, mushroom.edibility), []).append(mushroom)
+
+    @classmethod
+    def build(cls, version=None):
+        """Строит снимок одним запросом к БД (и одним - к копиям фотографий)"""
+        # Копии фотографий нужны карточкам всех списков, загружаем их сразу
+        mushrooms = Mushroom.objects.prefetch_related('photo_variants').order_by('russian_name', 'id')
+        return cls(list(mushrooms), version)
+
+    def select(self, edibilities, mushroom_type=None):
+        """Грибы с заданной съедобностью (и типом) в порядке галереи"""
+        types = [mushroom_type] if mushroom_type else [value for value, _ in Mushroom.MUSHROOM_TYPES]
+        groups = [
+            self.groups.get((current_type, edibility), [])
+            for current_type in types
+            for edibility in edibilities
+        ]
+        if len(groups) == 1:
+            return list(groups[0])
+        return sorted(
+            (mushroom for group in groups for mushroom in group),
+            key=lambda mushroom: (mushroom.russian_name, mushroom.id),
+        )
+
+    def by_type(self, edibilities):
+        """Словарь тип -> грибы с заданной съедобностью"""
+        return {
+            mushroom_type: self.select(edibilities, mushroom_type)
+            for mushroom_type, _ in Mushroom.MUSHROOM_TYPES
+        }
+
+    def for_district(self, district_id):
+        """Снимок только из грибов района"""
+        subset = self.districts.get(district_id)
+        if subset is None:
+            ids = set(
+                Mushroom.districts.through.objects
+                .filter(district_id=district_id)
+                .values_list('mushroom_id', flat=True)
+            )
+            subset = CatalogSnapshot([mushroom for mushroom in self.mushrooms if mushroom.id in ids], self.version)
+            self.districts[district_id] = subset
+        return subset
+
+    def page_after(self, position, page_size):
+        """Страница галереи после позиции (название, id) и признак продолжения"""
+        start = bisect_right(self.keys, position) if position else 0
+        page = self.mushrooms[start:start + page_size]
+        return page, start + page_size < len(self.mushrooms)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_catalog_snapshot():
+    """Снимок каталога текущей версии, при необходимости строит его"""
+    global _snapshot
+    version = get_catalog_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _snapshot_lock:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = CatalogSnapshot.build(version)
+            snapshot = _snapshot
+    return snapshot
+
+
+def month_masks(month):
+    """Маски season_months, в которых отмечен месяц"""
+    key = f'mushrooms:season_masks:{get_catalog_version()}'
+    masks = cache.get(key)
+    if masks is None:
+        masks = list(Mushroom.objects.order_by().values_list('season_months', flat=True).distinct())
+        cache.set(key, masks, getattr(settings, 'PAGE_CACHE_TIMEOUT', 24 * 60 * 60))
+    return [mask for mask in masks if mask & month_bit(month)]
+
+
+def fruiting_in_month(month, edibilities=None, district_id=None):
+    """Грибы, плодоносящие в месяце (1-12), в порядке галереи"""
+    mushrooms = Mushroom.objects.filter(season_months__in=month_masks(month)).prefetch_related('photo_variants')
+    if edibilities:
+        mushrooms = mushrooms.filter(edibility__in=edibilities)
+    if district_id:
+        mushrooms = mushrooms.filter(districts=district_id)
+    return mushrooms.order_by('russian_name', 'id')
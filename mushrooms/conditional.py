@@ -0,0 +1,139 @@
+"""Условные GET-запросы к страницам каталога.
+
+ETag и Last-Modified считаются по полям updated_at: для списков - по
+всему каталогу, районам, связям с ними и копиям фотографий, для страницы
+гриба - по самому грибу, его двойникам, характеристикам, районам,
+похожим грибам и копиям их фотографий. В ETag входит и версия каталога,
+поэтому любое изменение, замеченное сигналами (signals.py), меняет его.
+Если страница не изменилась, на If-None-Match и If-Modified-Since
+отвечаем 304 без отрисовки шаблона. Отпечатки кэшируются до смены
+версии каталога. Списки зависят ещё и
+от текущего месяца (грибы сезона на главной), поэтому их ETag включает
+месяц, а Last-Modified не раньше его начала.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .cache import get_catalog_version
+from .models import District, Lookalike, Mushroom, MushroomCharacteristic, MushroomSimilarity, PhotoVariant
+from .seasons import current_month
+
+
+def _fingerprint(*parts):
+    payload = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _cached_stamp(key, compute):
+    stamp = cache.get(key)
+    if stamp is None:
+        stamp = compute()
+        if stamp is not None:
+            cache.set(key, stamp, getattr(settings, 'PAGE_CACHE_TIMEOUT', 24 * 60 * 60))
+    return stamp
+
+
+def catalog_stamp():
+    """(время последнего изменения, отпечаток) списка грибов"""
+
+    def compute():
+        # Число грибов учитывается, чтобы заметить удаление
+        data = Mushroom.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        # Связи с районами пересоздаются целиком, поэтому новый набор даёт новый максимальный id
+        districts = Mushroom.districts.through.objects.aggregate(last_id=Max('id'), count=Count('id'))
+        # Копии фотографий создаются уже после сохранения гриба и меняют адреса картинок
+        photos = PhotoVariant.objects.aggregate(last_id=Max('id'), count=Count('id'))
+        # Названия районов выводятся в фильтре списков и на страницах районов
+        district_data = District.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        last_modified = _latest(data['last_modified'], district_data['last_modified'])
+        return last_modified, _fingerprint(
+            'catalog', version, last_modified, data['count'], districts['last_id'], districts['count'],
+            photos['last_id'], photos['count'], district_data['count'],
+        )
+
+    version = get_catalog_version()
+    return _cached_stamp(f'mushrooms:stamp:{version}', compute)
+
+
+def mushroom_stamp(mushroom_id):
+    """(время последнего изменения, отпечаток) страницы гриба или None"""
+
+    def compute():
+        updated_at = Mushroom.objects.filter(id=mushroom_id).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        lookalikes = Lookalike.objects.filter(mushroom_id=mushroom_id).aggregate(
+            last_modified=Max('updated_at'), target_modified=Max('lookalike__updated_at'), count=Count('id')
+        )
+        characteristics = MushroomCharacteristic.objects.filter(mushroom_id=mushroom_id).aggregate(
+            last_modified=Max('updated_at'), count=Count('id')
+        )
+        # Строки сходства пересоздаются при пересчёте, поэтому новый набор даёт новый максимальный id
+        similar = MushroomSimilarity.objects.filter(mushroom_id=mushroom_id).aggregate(
+            last_id=Max('id'), target_modified=Max('similar__updated_at'), count=Count('id')
+        )
+        districts = Mushroom.districts.through.objects.filter(mushroom_id=mushroom_id).aggregate(
+            last_id=Max('id'), target_modified=Max('district__updated_at'), count=Count('id')
+        )
+        similar_ids = MushroomSimilarity.objects.filter(mushroom_id=mushroom_id).values('similar_id')
+        photos = PhotoVariant.objects.filter(
+            Q(mushroom_id=mushroom_id) | Q(mushroom_id__in=similar_ids)
+        ).aggregate(last_id=Max('id'), count=Count('id'))
+        last_modified = _latest(
+            updated_at,
+            lookalikes['last_modified'],
+            lookalikes['target_modified'],
+            characteristics['last_modified'],
+            similar['target_modified'],
+            districts['target_modified'],
+        )
+        # Без рассчитанных похожих страница показывает грибы того же типа из всего каталога
+        catalog = catalog_stamp() if not similar['count'] else (None, None)
+        last_modified = _latest(last_modified, catalog[0])
+        return last_modified, _fingerprint(
+            'mushroom', version, mushroom_id, last_modified, lookalikes['count'], characteristics['count'],
+            similar['last_id'], similar['count'], districts['last_id'], districts['count'],
+            photos['last_id'], photos['count'], catalog[1],
+        )
+
+    version = get_catalog_version()
+    return _cached_stamp(f'mushrooms:stamp:{version}:{mushroom_id}', compute)
+
+
+def _month_start():
+    return timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _catalog_etag(request, *args, **kwargs):
+    return _fingerprint(catalog_stamp()[1], current_month())
+
+
+def _catalog_last_modified(request, *args, **kwargs):
+    return _latest(catalog_stamp()[0], _month_start())
+
+
+def _mushroom_etag(request, mushroom_id):
+    stamp = mushroom_stamp(mushroom_id)
+    return stamp[1] if stamp else None
+
+
+def _mushroom_last_modified(request, mushroom_id):
+    stamp = mushroom_stamp(mushroom_id)
+    return stamp[0] if stamp else None
+
+
+# Страницы со списками грибов
+catalog_condition = condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
+
+# Страница гриба; для несуществующего гриба представление вернёт 404
+mushroom_condition = condition(etag_func=_mushroom_etag, last_modified_func=_mushroom_last_modified)
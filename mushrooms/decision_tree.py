@@ -0,0 +1,147 @@
+"""Скомпилированное дерево решений определителя.
+
+Дерево строится командой compile_identifier_tree тем же жадным выбором
+вопроса по приросту информации, что и пошаговый определитель, и
+сохраняется в JSON вместе с хешем содержимого и отпечатком исходных
+данных. Во время запроса дерево проходится за O(глубины).
+
+Грибы без значения выбранной характеристики попадают в отдельную ветку
+'missing' - так же, как отдельным исходом их считает information_gain.
+Ответом пользователя в эту ветку не попасть, но она сохраняет все грибы
+в дереве и в его статистике.
+"""
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+TREE_FORMAT = 2
+
+
+def get_tree_path():
+    """Путь к файлу дерева решений"""
+    return Path(getattr(settings, 'IDENTIFIER_TREE_PATH', Path(settings.BASE_DIR) / 'identifier_tree.json'))
+
+
+def compile_tree(index):
+    """Строит дерево решений по индексу определителя"""
+
+    def build(candidates, answered_ids):
+        characteristic = index.next_question(candidates, answered_ids)
+        if characteristic is None:
+            return {'mushrooms': index.ids_from_bits(candidates)}
+
+        answered_ids = answered_ids | {characteristic['id']}
+        children = {}
+        rest = candidates
+        for value in index.option_values[characteristic['id']]:
+            bits = candidates & index.bitsets.get((characteristic['id'], value), 0)
+            rest &= ~bits
+            if bits:
+                children[value] = build(bits, answered_ids)
+        node = {'question': characteristic['id'], 'children': children}
+        if rest:
+            node['missing'] = build(rest, answered_ids)
+        return node
+
+    return build(index.all_bits, frozenset())
+
+
+def tree_stats(tree):
+    """Глубина и сбалансированность дерева"""
+    leaves = []
+
+    def visit(node, depth):
+        if 'mushrooms' in node:
+            leaves.append((depth, len(node['mushrooms'])))
+            return
+        for child in node['children'].values():
+            visit(child, depth + 1)
+        if 'missing' in node:
+            visit(node['missing'], depth + 1)
+
+    visit(tree, 0)
+    depths = [depth for depth, _ in leaves]
+    identified = sum(size for _, size in leaves)
+    max_depth = max(depths)
+    min_depth = min(depths)
+    return {
+        'max_depth': max_depth,
+        'min_depth': min_depth,
+        'avg_depth': round(sum(depth * size for depth, size in leaves) / identified, 2) if identified else 0,
+        'leaves': len(leaves),
+        # Листья, где оставшиеся грибы уже не различить имеющимися вопросами
+        'ambiguous_leaves': sum(1 for _, size in leaves if size > 1),
+        'largest_leaf': max(size for _, size in leaves),
+        'balance': round(min_depth / max_depth, 2) if max_depth else 1.0,
+    }
+
+
+def content_hash(catalog_signature, tree):
+    """Хеш содержимого артефакта"""
+    payload = json.dumps([catalog_signature, tree], ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def save_tree(index, tree, path=None):
+    """Сохраняет дерево в компактный JSON и возвращает хеш содержимого"""
+    path = Path(path) if path else get_tree_path()
+    digest = content_hash(index.signature, tree)
+    artifact = {
+        'format': TREE_FORMAT,
+        'catalog_signature': index.signature,
+        'content_hash': digest,
+        'stats': tree_stats(tree),
+        'tree': tree,
+    }
+    path.write_text(json.dumps(artifact, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+    return digest
+
+
+def read_tree(path=None):
+    """Читает артефакт и проверяет его хеш; при ошибке возвращает None"""
+    path = Path(path) if path else get_tree_path()
+    try:
+        artifact = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if artifact.get('format') != TREE_FORMAT:
+        return None
+    if artifact.get('content_hash') != content_hash(artifact.get('catalog_signature'), artifact.get('tree')):
+        return None
+    return artifact
+
+
+_artifact = None
+_artifact_loaded = False
+_artifact_lock = threading.Lock()
+
+
+def load_tree():
+    """Загружает дерево один раз на процесс"""
+    global _artifact, _artifact_loaded
+    if not _artifact_loaded:
+        with _artifact_lock:
+            if not _artifact_loaded:
+                _artifact = read_tree()
+                _artifact_loaded = True
+    return _artifact
+
+
+def walk_tree(tree, selected_options):
+    """Проходит дерево по ответам пользователя.
+
+    Возвращает (узел, число использованных ответов). Узел - первый вопрос,
+    на который ещё нет ответа, или лист с оставшимися грибами.
+    """
+    node = tree
+    used = 0
+    while 'question' in node:
+        value = selected_options.get(str(node['question']))
+        if value is None:
+            break
+        node = node['children'].get(value, {'mushrooms': []})
+        used += 1
+    return node, used
@@ -0,0 +1,121 @@
+"""Районы распространения грибов.
+
+Поле Mushroom.distribution - свободный текст вида «Аргаяшский район:
+оз. Увильды, Сосновский район: д. Биргильда» или «Аргаяшский,
+Каслинский и Нязепетровский районы». parse_districts находит в нём
+названия районов и городских округов и приводит их к единому виду
+(«Чебарскульский» -> «Чебаркульский район»), а sync_districts и
+rebuild_districts записывают связи гриб-район. Число грибов по районам
+кэшируется до смены версии каталога.
+"""
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .cache import catalog_changed, get_catalog_version
+from .models import District, Mushroom
+
+TOKEN_RE = re.compile(r'[а-яё]+|[^\sа-яё]', re.IGNORECASE)
+ADJECTIVE_ENDINGS = ('ский', 'цкий')
+
+# Слова, после которых идут названия районов: единственное и множественное число
+KIND_WORDS = {
+    'район': ('district', False), 'района': ('district', False), 'районе': ('district', False),
+    'районы': ('district', True), 'районов': ('district', True), 'районах': ('district', True),
+    'округ': ('urban_okrug', False), 'округе': ('urban_okrug', False),
+    'округа': ('urban_okrug', True), 'округов': ('urban_okrug', True),
+}
+# Слова, которые могут стоять между названиями районов и словом «район»
+LIST_WORDS = {',', 'и', 'городской', 'городские', 'городского', 'муниципальный', 'муниципальные'}
+
+# Опечатки и варианты написания в текстах атласа
+SPELLING_FIXES = {
+    'чебарскульский': 'чебаркульский',
+}
+
+
+def district_key(adjective, kind):
+    """Ключ района: нижний регистр, «ё» как «е», исправленные опечатки"""
+    adjective = adjective.lower().replace('ё', 'е')
+    return f'{SPELLING_FIXES.get(adjective, adjective)}:{kind}'
+
+
+def district_name(adjective, kind):
+    """Название района для показа: «Аргаяшский район», «Озёрский городской округ»"""
+    adjective = SPELLING_FIXES.get(adjective.lower(), adjective.lower()).capitalize()
+    return f'{adjective} {dict(District.KIND_CHOICES)[kind].lower()}'
+
+
+def parse_districts(text):
+    """Районы из текста распространения: список (ключ, название) без повторов"""
+    found = {}
+    pending = []
+    for token in TOKEN_RE.findall(text or ''):
+        lower = token.lower()
+        if token[0].isupper() and lower.endswith(ADJECTIVE_ENDINGS):
+            pending.append(token)
+        elif lower in KIND_WORDS:
+            kind, plural = KIND_WORDS[lower]
+            # «Аргаяшский, Каслинский районы» - все названия, «Карагайский бор, Сосновский район» - последнее
+            for adjective in (pending if plural else pending[-1:]):
+                found.setdefault(district_key(adjective, kind), district_name(adjective, kind))
+            pending = []
+        elif lower not in LIST_WORDS:
+            pending = []
+    return list(found.items())
+
+
+def get_or_create_districts(parsed):
+    """Районы по результату parse_districts, недостающие создаются"""
+    districts = {district.key: district for district in District.objects.filter(key__in=[key for key, _ in parsed])}
+    missing = [
+        District(key=key, name=name, kind=key.rsplit(':', 1)[1])
+        for key, name in parsed if key not in districts
+    ]
+    if missing:
+        District.objects.bulk_create(missing, ignore_conflicts=True)
+        districts = {district.key: district for district in District.objects.filter(key__in=[key for key, _ in parsed])}
+    return [districts[key] for key, _ in parsed]
+
+
+def sync_districts(mushroom):
+    """Связывает гриб с районами из его поля distribution"""
+    mushroom.districts.set(get_or_create_districts(parse_districts(mushroom.distribution)))
+
+
+def rebuild_districts(batch_size=500):
+    """Заново разбирает распространение всех грибов.
+
+    Возвращает (число грибов, число связей, число районов). Районы, у
+    которых не осталось грибов, удаляются.
+    """
+    parsed = {}
+    names = {}
+    for mushroom_id, distribution in Mushroom.objects.values_list('id', 'distribution').iterator():
+        parsed[mushroom_id] = parse_districts(distribution)
+        names.update(parsed[mushroom_id])
+    districts = {district.key: district.id for district in get_or_create_districts(list(names.items()))}
+
+    Through = Mushroom.districts.through
+    Through.objects.all().delete()
+    links = [
+        Through(mushroom_id=mushroom_id, district_id=districts[key])
+        for mushroom_id, pairs in parsed.items()
+        for key, _ in pairs
+    ]
+    Through.objects.bulk_create(links, batch_size=batch_size)
+    District.objects.filter(mushrooms__isnull=True).delete()
+    catalog_changed()
+    return len(parsed), len(links), len(districts)
+
+
+def district_counts():
+    """Районы по алфавиту с атрибутом mushroom_count - числом грибов"""
+    key = f'mushrooms:district_counts:{get_catalog_version()}'
+    districts = cache.get(key)
+    if districts is None:
+        districts = list(District.objects.annotate(mushroom_count=Count('mushrooms')).order_by('name'))
+        cache.set(key, districts, getattr(settings, 'PAGE_CACHE_TIMEOUT', 24 * 60 * 60))
+    return districts
@@ -0,0 +1,205 @@
+"""Поиск повторяющихся фотографий по перцептивным хешам.
+
+Одинаковые файлы хранилище объединяет само (storage.py), а пересохранённые
+с другим сжатием или слегка обрезанные копии отличаются побайтно. Для
+каждой фотографии считаются два 64-битных хеша:
+
+- dHash - знаки разностей яркости соседних пикселей уменьшенной до 9×8 картинки;
+- pHash - знаки низкочастотных коэффициентов DCT картинки 32×32 относительно медианы.
+
+Похожие изображения дают хеши с малым расстоянием Хэмминга. Пары ищутся
+по частям хеша (multi-index hashing, см. near_pairs), поэтому не нужно
+сравнивать каждую пару фотографий.
+"""
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+from PIL import Image, ImageOps
+
+HASH_KINDS = ('phash', 'dhash')
+# Порог расстояния Хэмминга (из 64 бит), при котором фото считаются одним снимком
+DEFAULT_DISTANCE = 8
+
+DHASH_SIZE = 8
+PHASH_SIZE = 32
+PHASH_LOW = 8
+
+
+def _dct_matrix(size):
+    """Матрица DCT-II с нормировкой (ортогональная)"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / size)
+
+
+DCT_MATRIX = _dct_matrix(PHASH_SIZE)
+
+
+def _bits_to_hex(bits):
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return f'{value:016x}'
+
+
+def open_grayscale(file):
+    """Фото в оттенках серого; JPEG декодируется сразу в уменьшенном виде"""
+    image = Image.open(file)
+    # draft ускоряет чтение больших JPEG в разы: хешам нужно лишь 32×32 пикселя
+    image.draft('L', (PHASH_SIZE * 4, PHASH_SIZE * 4))
+    image = ImageOps.exif_transpose(image)
+    return image.convert('L')
+
+
+def dhash(image):
+    pixels = np.asarray(image.resize((DHASH_SIZE + 1, DHASH_SIZE), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_hex(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image):
+    pixels = np.asarray(image.resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS), dtype=np.float64)
+    coefficients = DCT_MATRIX @ pixels @ DCT_MATRIX.T
+    low = coefficients[:PHASH_LOW, :PHASH_LOW]
+    # Постоянная составляющая (средняя яркость) в медиану не входит
+    median = np.median(low.flatten()[1:])
+    return _bits_to_hex(low > median)
+
+
+def photo_hashes(file):
+    """(dHash, pHash) фотографии в hex"""
+    with open_grayscale(file) as image:
+        return dhash(image), phash(image)
+
+
+# Число единичных бит в каждом байте: numpy 1.x не умеет считать их для uint64
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+# Хеш делится на части для multi-index hashing
+CHUNKS = 4
+CHUNK_BITS = 16
+
+
+def popcount(values):
+    """Число единичных бит в каждом элементе массива uint64"""
+    return POPCOUNT[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+@lru_cache(maxsize=None)
+def flip_masks(radius):
+    """Маски XOR, меняющие в части хеша не больше radius бит"""
+    masks = [0]
+    for count in range(1, radius + 1):
+        for positions in combinations(range(CHUNK_BITS), count):
+            masks.append(sum(1 << position for position in positions))
+    return np.array(masks, dtype=np.uint16)
+
+
+def near_pairs(values, radius):
+    """Пары индексов (i < j) хешей, отличающихся не больше чем на radius бит.
+
+    Multi-index hashing: 64 бита делятся на CHUNKS частей, и если хеши
+    отличаются не больше чем на radius бит, то хотя бы в одной части
+    различий не больше radius // CHUNKS (принцип Дирихле). Для каждой
+    части кандидаты берутся из корзин соседних значений, точное
+    расстояние проверяется только для них.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    count = len(values)
+    found = []
+    for index in range(CHUNKS):
+        chunks = ((values >> np.uint64(index * CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+        # Хеши, отсортированные по значению части, и начало каждого значения в этом порядке
+        order = np.argsort(chunks, kind='stable')
+        sizes = np.bincount(chunks, minlength=1 << CHUNK_BITS)
+        starts = np.cumsum(sizes) - sizes
+        for mask in flip_masks(radius // CHUNKS):
+            keys = chunks ^ mask
+            left = starts[keys]
+            matches = sizes[keys]
+            total = int(matches.sum())
+            if not total:
+                continue
+            # Разворачиваем диапазоны совпадений в пары (запрос, кандидат)
+            queries = np.repeat(np.arange(count), matches)
+            offsets = np.arange(total) - np.repeat(np.cumsum(matches) - matches, matches)
+            others = order[np.repeat(left, matches) + offsets]
+            queries, others = queries[queries < others], others[queries < others]
+            close = popcount(values[queries] ^ values[others]) <= radius
+            found.append(queries[close] * count + others[close])
+    if not found:
+        return []
+    return [divmod(int(pair), count) for pair in np.unique(np.concatenate(found))]
+
+
+def find_clusters(hashes, distance=DEFAULT_DISTANCE):
+    """Группы похожих элементов из {элемент: хеш в hex}; одиночки не возвращаются"""
+    items = list(hashes)
+    values = [int(hashes[item], 16) for item in items]
+
+    # Объединение соседей в группы (система непересекающихся множеств)
+    parents = list(range(len(items)))
+
+    def root(position):
+        while parents[position] != position:
+            parents[position] = parents[parents[position]]
+            position = parents[position]
+        return position
+
+    for first, second in near_pairs(values, distance):
+        first, second = root(first), root(second)
+        if first != second:
+            parents[second] = first
+
+    groups = {}
+    for position, item in enumerate(items):
+        groups.setdefault(root(position), []).append(item)
+    clusters = [group for group in groups.values() if len(group) > 1]
+    clusters.sort(key=lambda group: (-len(group), min(group)))
+    return clusters
+
+
+def update_photo_hashes(mushroom, force=False):
+    """Считает хеши фотографии гриба; возвращает True, если они изменились"""
+    from .models import Mushroom
+
+    if not mushroom.photo or not mushroom.photo.storage.exists(mushroom.photo.name):
+        hashes = ('', '')
+    elif mushroom.photo_phash and not force:
+        return False
+    else:
+        mushroom.photo.open('rb')
+        try:
+            hashes = photo_hashes(mushroom.photo)
+        finally:
+            mushroom.photo.close()
+    if hashes == (mushroom.photo_dhash, mushroom.photo_phash):
+        return False
+    mushroom.photo_dhash, mushroom.photo_phash = hashes
+    # update() вместо save(): хеши не влияют на страницы и не должны запускать сигналы
+    Mushroom.objects.filter(id=mushroom.id).update(photo_dhash=hashes[0], photo_phash=hashes[1])
+    return True
+
+
+def update_photo_hashes_by_id(mushroom_id):
+    from .models import Mushroom
+
+    mushroom = Mushroom.objects.filter(id=mushroom_id).first()
+    if mushroom is not None:
+        update_photo_hashes(mushroom, force=True)
+
+
+def duplicate_clusters(kind='phash', distance=DEFAULT_DISTANCE):
+    """Группы грибов с похожими фотографиями (по уже посчитанным хешам)"""
+    from .models import Mushroom
+
+    field = f'photo_{kind}'
+    mushrooms = {
+        mushroom.id: mushroom
+        for mushroom in Mushroom.objects.exclude(**{field: ''}).only('id', 'russian_name', 'photo', field)
+    }
+    clusters = find_clusters({mushroom_id: getattr(mushroom, field) for mushroom_id, mushroom in mushrooms.items()},
+                             distance)
+    return [sorted((mushrooms[mushroom_id] for mushroom_id in cluster), key=lambda mushroom: mushroom.id)
+            for cluster in clusters]
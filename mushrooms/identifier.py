@@ -0,0 +1,405 @@
+"""Индекс определителя грибов.
+
+Для каждой пары (характеристика, значение варианта) хранится битовое
+множество грибов, у которых эта характеристика имеет такое значение.
+Подбор грибов по ответам пользователя сводится к побитовому И этих
+множеств без SQL-запросов с JOIN на каждый ответ.
+
+Те же данные хранятся матрицей NumPy гриб × характеристика, по которой
+взвешенная оценка всех грибов считается векторными операциями.
+
+Индекс живёт в памяти процесса и привязан к версии каталога (см.
+cache.py): изменения из другого процесса сервера или из команд
+управления увеличивают общую версию, и индекс пересобирается.
+"""
+import hashlib
+import math
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .cache import get_catalog_version
+from .decision_tree import load_tree, walk_tree
+from .models import Characteristic, Mushroom, MushroomCharacteristic
+
+DEFAULT_WEIGHTS = {
+    'regular': 1.0,
+    'important': 2.0,
+    'important_mismatch_penalty': 1.0,
+}
+
+
+class IdentifierIndex:
+    """Битовые множества грибов по значениям характеристик"""
+
+    def __init__(self, mushroom_ids, rows, characteristics=(), version=None):
+        self.version = version
+        # Позиция бита = порядковый номер гриба в порядке сортировки модели
+        self.mushroom_ids = list(mushroom_ids)
+        self.positions = {mushroom_id: pos for pos, mushroom_id in enumerate(self.mushroom_ids)}
+        self.all_bits = (1 << len(self.mushroom_ids)) - 1
+        rows = sorted(rows)
+
+        # Вопросы определителя в порядке показа: id, текст и варианты ответа
+        self.characteristics = list(characteristics)
+        self.characteristics_by_id = {
+            characteristic['id']: characteristic for characteristic in self.characteristics
+        }
+        self.option_values = {
+            characteristic['id']: [value for value, _ in characteristic['options']]
+            for characteristic in self.characteristics
+        }
+
+        # Матрица гриб × характеристика с кодами вариантов (0 - значение не задано)
+        self.columns = {characteristic_id: col for col, characteristic_id in enumerate(self.option_values)}
+        self.option_codes = {
+            (characteristic_id, value): code
+            for characteristic_id, values in self.option_values.items()
+            for code, value in enumerate(values, 1)
+        }
+        self.important = np.array([c['is_important'] for c in self.characteristics], dtype=bool)
+        # Хранение по столбцам: оценка читает только столбцы отвеченных вопросов
+        self.matrix = np.zeros((len(self.mushroom_ids), len(self.columns)), dtype=np.int16, order='F')
+        for mushroom_id, characteristic_id, value in rows:
+            pos = self.positions.get(mushroom_id)
+            code = self.option_codes.get((characteristic_id, value))
+            if pos is not None and code is not None:
+                self.matrix[pos, self.columns[characteristic_id]] = code
+
+        # Битовые множества строятся из столбцов матрицы за один проход на вариант
+        self.bitsets = {}
+        for (characteristic_id, value), code in self.option_codes.items():
+            column = self.matrix[:, self.columns[characteristic_id]]
+            bits = self.bits_from_mask(column == code)
+            if bits:
+                self.bitsets[(characteristic_id, value)] = bits
+
+        # Частоты вариантов по всему каталогу - стартовая таблица для выбора вопроса
+        self.option_frequencies = {}
+        for characteristic_id in self.option_values:
+            self.option_frequencies[characteristic_id] = self.option_counts(self.all_bits, characteristic_id)
+
+        # Отпечаток исходных данных: по нему проверяется актуальность дерева решений
+        digest = hashlib.sha256()
+        for part in (self.mushroom_ids, rows, [(c['id'], c['options']) for c in self.characteristics]):
+            digest.update(repr(part).encode('utf-8'))
+        self.signature = digest.hexdigest()
+
+    @classmethod
+    def build(cls, version=None):
+        """Строит индекс тремя запросами к базе"""
+        mushroom_ids = Mushroom.objects.values_list('id', flat=True)
+        rows = MushroomCharacteristic.objects.values_list(
+            'mushroom_id', 'characteristic_id', 'option__value'
+        )
+        characteristics = [
+            {
+                'id': characteristic.id,
+                'name': characteristic.name,
+                'question': characteristic.question,
+                'is_important': characteristic.is_important,
+                'options': [
+                    (option.value, option.description)
+                    for option in characteristic.characteristicoption_set.all()
+                ],
+            }
+            for characteristic in Characteristic.objects.prefetch_related('characteristicoption_set')
+        ]
+        return cls(mushroom_ids, rows, characteristics, version)
+
+    def bits_for(self, characteristic_id, value):
+        """Битовое множество грибов с заданным значением характеристики"""
+        try:
+            characteristic_id = int(characteristic_id)
+        except (TypeError, ValueError):
+            return 0
+        return self.bitsets.get((characteristic_id, value), 0)
+
+    def match(self, selected_options):
+        """Битовое множество грибов, подходящих под все выбранные ответы"""
+        bits = self.all_bits
+        for char_id, option_value in selected_options.items():
+            bits &= self.bits_for(char_id, option_value)
+            if not bits:
+                break
+        return bits
+
+    def match_counters(self, selected_options):
+        """Побитовые счётчики совпадений для всех грибов сразу.
+
+        counters[i] содержит i-й разряд числа совпавших ответов каждого
+        гриба, так что одно сложение ответа стоит O(log n) операций над
+        битовыми множествами, а не проход по всем грибам.
+        """
+        counters = []
+        for char_id, option_value in selected_options.items():
+            carry = self.bits_for(char_id, option_value)
+            for i in range(len(counters)):
+                if not carry:
+                    break
+                counters[i], carry = counters[i] ^ carry, counters[i] & carry
+            if carry:
+                counters.append(carry)
+        return counters
+
+    def bits_with_count(self, counters, count):
+        """Битовое множество грибов, совпавших ровно по count ответам"""
+        if count >> len(counters):
+            return 0
+        bits = self.all_bits
+        for i, counter in enumerate(counters):
+            bits &= counter if (count >> i) & 1 else ~counter
+        return bits
+
+    def rank(self, selected_options, min_matches=None):
+        """Ранжированный список (id гриба, число совпадений, оценка 0-100).
+
+        По умолчанию нужны совпадения по всем ответам; min_matches
+        позволяет показывать и частичные совпадения (k из n). Порядок -
+        по взвешенной оценке, затем по числу совпадений и названию.
+        """
+        total = len(selected_options)
+        if min_matches is None:
+            min_matches = total
+        min_matches = max(min_matches, 0)
+
+        counters = self.match_counters(selected_options)
+        positions, counts = [], []
+        for count in range(total, min_matches - 1, -1):
+            level = self.positions_from_bits(self.bits_with_count(counters, count))
+            positions.append(level)
+            counts.append(np.full(len(level), count))
+        if not positions:
+            return []
+        positions = np.concatenate(positions)
+        counts = np.concatenate(counts)
+
+        scores, max_score = self.weighted_scores(selected_options)
+        scores = scores[positions]
+        order = np.lexsort((positions, -counts, -scores))
+        if max_score:
+            relevance = np.clip(np.rint(scores * 100 / max_score), 0, 100).astype(int)
+        else:
+            relevance = np.full(len(positions), 100)
+        return [
+            (self.mushroom_ids[positions[i]], int(counts[i]), int(relevance[i]))
+            for i in order
+        ]
+
+    def facet_counts(self, selected_options):
+        """Счётчики кандидатов по всем вариантам всех характеристик за один проход.
+
+        Для каждой характеристики учитываются все ответы, кроме ответа на
+        неё саму, - так видно, что будет при выборе другого варианта.
+        """
+        answered = {}
+        extra = self.all_bits
+        for char_id, option_value in selected_options.items():
+            bits = self.bits_for(char_id, option_value)
+            try:
+                characteristic_id = int(char_id)
+            except (TypeError, ValueError):
+                characteristic_id = None
+            if characteristic_id in self.option_values:
+                answered[characteristic_id] = bits
+            else:
+                extra &= bits
+
+        # Префиксные и суффиксные пересечения дают "все ответы, кроме i-го" за O(n)
+        characteristic_ids = list(self.option_values)
+        masks = [answered.get(characteristic_id, self.all_bits) for characteristic_id in characteristic_ids]
+        prefix = [extra]
+        for mask in masks:
+            prefix.append(prefix[-1] & mask)
+        suffix = [self.all_bits]
+        for mask in reversed(masks):
+            suffix.append(suffix[-1] & mask)
+        suffix.reverse()
+
+        return {
+            characteristic_id: self.option_counts(prefix[i] & suffix[i + 1], characteristic_id)
+            for i, characteristic_id in enumerate(characteristic_ids)
+        }, prefix[-1]
+
+    def option_counts(self, candidates, characteristic_id):
+        """Сколько кандидатов останется при каждом варианте ответа"""
+        if candidates == self.all_bits and characteristic_id in self.option_frequencies:
+            return self.option_frequencies[characteristic_id]
+        return {
+            value: (candidates & self.bitsets.get((characteristic_id, value), 0)).bit_count()
+            for value in self.option_values.get(characteristic_id, ())
+        }
+
+    def information_gain(self, candidates, characteristic_id):
+        """Ожидаемое уменьшение энтропии множества кандидатов после ответа.
+
+        Грибы без значения этой характеристики считаются отдельным исходом.
+        """
+        total = candidates.bit_count()
+        if total <= 1:
+            return 0.0
+        counts = list(self.option_counts(candidates, characteristic_id).values())
+        counts.append(total - sum(counts))
+        remaining = sum(count * math.log2(count) for count in counts if count > 0) / total
+        return math.log2(total) - remaining
+
+    def next_question(self, candidates, answered_ids):
+        """Характеристика, лучше всего разделяющая оставшихся кандидатов"""
+        best, best_gain = None, 0.0
+        for characteristic in self.characteristics:
+            if characteristic['id'] in answered_ids:
+                continue
+            gain = self.information_gain(candidates, characteristic['id'])
+            # При равенстве остаётся вопрос, идущий раньше по порядку
+            if gain > best_gain + 1e-9:
+                best, best_gain = characteristic, gain
+        return best
+
+    def bits_from_mask(self, mask):
+        """Булев вектор по грибам -> битовое множество"""
+        return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+    def positions_from_bits(self, bits):
+        """Битовое множество -> массив позиций грибов"""
+        size = len(self.mushroom_ids)
+        raw = np.frombuffer(bits.to_bytes((size + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, count=size, bitorder='little'))
+
+    def ids_from_bits(self, bits):
+        """Переводит битовое множество в список id грибов"""
+        return [self.mushroom_ids[pos] for pos in self.positions_from_bits(bits)]
+
+    def weighted_scores(self, selected_options):
+        """Взвешенная оценка всех грибов векторными операциями над столбцами матрицы.
+
+        Совпадение по характеристике добавляет её вес (важные весят больше),
+        несовпадение по важной характеристике, у которой значение у гриба
+        известно, вычитает штраф. Возвращает (оценки, максимальная оценка).
+        """
+        weights = get_weights()
+        scores = np.zeros(len(self.mushroom_ids))
+        max_score = 0.0
+        for char_id, option_value in selected_options.items():
+            try:
+                characteristic_id = int(char_id)
+            except (TypeError, ValueError):
+                continue
+            col = self.columns.get(characteristic_id)
+            if col is None:
+                continue
+
+            important = self.important[col]
+            weight = weights['important'] if important else weights['regular']
+            column = self.matrix[:, col]
+            matches = column == self.option_codes.get((characteristic_id, option_value), -1)
+            scores += weight * matches
+            if important and weights['important_mismatch_penalty']:
+                scores -= weights['important_mismatch_penalty'] * ((column != 0) & ~matches)
+            max_score += weight
+        return scores, max_score
+
+
+def get_weights():
+    """Веса характеристик для взвешенной оценки (настройка IDENTIFIER_WEIGHTS)"""
+    weights = dict(DEFAULT_WEIGHTS)
+    weights.update(getattr(settings, 'IDENTIFIER_WEIGHTS', {}))
+    return weights
+
+
+def match_percentage(match_count, total_selected):
+    """Процент совпадения; без ответов любой гриб подходит на 100%"""
+    return int((match_count / total_selected) * 100) if total_selected > 0 else 100
+
+
+def rank_mushrooms(selected_options, min_matches=None):
+    """Считает совпадения для всех грибов одним проходом по индексу"""
+    total_selected = len(selected_options)
+    return [
+        {
+            'mushroom_id': mushroom_id,
+            'match_count': match_count,
+            'match_percentage': match_percentage(match_count, total_selected),
+            'score': score,
+        }
+        for mushroom_id, match_count, score in get_identifier_index().rank(selected_options, min_matches)
+    ]
+
+
+def next_question(selected_options, skipped=()):
+    """Следующий вопрос пошагового определителя и живые счётчики кандидатов"""
+    index = get_identifier_index()
+    candidates = index.match(selected_options)
+    answered_ids = set()
+    for char_id in list(selected_options) + list(skipped):
+        try:
+            answered_ids.add(int(char_id))
+        except (TypeError, ValueError):
+            continue
+
+    # Если дерево решений собрано по текущим данным, следующий вопрос берётся
+    # из него за O(глубины); иначе считается по индексу на лету
+    characteristic = None
+    from_tree = False
+    artifact = load_tree()
+    if artifact and not skipped and artifact['catalog_signature'] == index.signature:
+        node, used = walk_tree(artifact['tree'], selected_options)
+        if used == len(selected_options):
+            characteristic = index.characteristics_by_id.get(node.get('question'))
+            from_tree = True
+    if not from_tree:
+        characteristic = index.next_question(candidates, answered_ids)
+
+    question = None
+    if characteristic is not None:
+        counts = index.option_counts(candidates, characteristic['id'])
+        question = {
+            'id': characteristic['id'],
+            'question': characteristic['question'],
+            'options': [
+                {'value': value, 'description': description, 'count': counts.get(value, 0)}
+                for value, description in characteristic['options']
+            ],
+        }
+
+    return {
+        'candidates_count': candidates.bit_count(),
+        'answered_questions': len(selected_options),
+        'question': question,
+    }
+
+
+def live_option_counts(selected_options):
+    """Сколько грибов подойдёт при выборе каждого варианта каждой характеристики"""
+    counts, candidates = get_identifier_index().facet_counts(selected_options)
+    return {
+        'candidates_count': candidates.bit_count(),
+        'characteristics': {
+            str(characteristic_id): option_counts
+            for characteristic_id, option_counts in counts.items()
+        },
+    }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_identifier_index():
+    """Индекс текущей версии каталога из памяти процесса, при необходимости строит его"""
+    global _index
+    version = get_catalog_version()
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = IdentifierIndex.build(version)
+            index = _index
+    return index
+
+
+def invalidate_identifier_index():
+    """Сбрасывает индекс; он будет перестроен при следующем обращении"""
+    global _index
+    with _index_lock:
+        _index = None
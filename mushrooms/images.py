@@ -0,0 +1,279 @@
+"""Уменьшенные копии фотографий грибов.
+
+Оригиналы из админки весят мегабайты, а карточка показывает картинку
+шириной в несколько сотен пикселей. Для каждой фотографии Pillow
+создаёт копии фиксированной ширины (PRESETS) в WebP и JPEG, а записи
+PhotoVariant хранят их адреса и размеры. Шаблоны выводят копии через
+<picture> и srcset (тег mushroom_picture), и браузер загружает
+ближайшую к нужной ширине. Копии привязаны к SHA-256 исходного файла и
+пересоздаются только при его изменении. Файлы копий, как и оригиналы,
+лежат в хранилище с адресацией по содержимому (storage.py).
+
+Там же считаются размеры фотографии, её основной цвет и крошечное
+превью в base64 (LQIP): они хранятся в полях Mushroom, и шаблоны
+выводят заглушку нужного размера, не открывая файл.
+
+Модели импортируются внутри функций: hash_photo и render_photo
+выполняются в процессах команды build_photo_variants, где Django не
+настроен.
+"""
+import base64
+import hashlib
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .cache import catalog_changed
+from .storage import acquire, get_photo_storage
+
+# Ширина копий: карточка списка, фото на странице гриба, то же для экранов высокой плотности
+PRESETS = {
+    'card': 400,
+    'detail': 800,
+    'retina': 1600,
+}
+# Параметры кодирования; WebP идёт первым источником в <picture>, JPEG - запасной вариант
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+VARIANTS_DIR = 'mushrooms/variants'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Превью-заглушка: не больше 16 пикселей по длинной стороне, браузер растягивает его с размытием
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_OPTIONS = {'format': 'WEBP', 'quality': 40}
+# Поля Mushroom, которые заполняет fill_photo_placeholder
+PLACEHOLDER_FIELDS = ['photo_width', 'photo_height', 'photo_color', 'photo_placeholder']
+EXIF_ORIENTATION = 0x0112
+
+
+def file_hash(file):
+    """SHA-256 содержимого файла (открытого или по пути)"""
+    digest = hashlib.sha256()
+    if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+        with open(file, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    else:
+        file.open('rb')
+        try:
+            for chunk in file.chunks(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        finally:
+            file.close()
+    return digest.hexdigest()
+
+
+def open_photo(file, draft_size=None):
+    """Фото в RGB с учётом поворота из EXIF; draft_size - нужный размер, JPEG декодируется уменьшенным"""
+    image = Image.open(file)
+    if draft_size:
+        image.draft('RGB', draft_size)
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Прозрачные PNG кладём на белый фон: JPEG прозрачность не поддерживает
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def preset_widths(original_width):
+    """Ширина каждой копии; копии не шире оригинала, одинаковые не повторяются"""
+    widths = {}
+    for preset, width in sorted(PRESETS.items(), key=lambda item: item[1]):
+        widths[preset] = min(width, original_width)
+        if width >= original_width:
+            break
+    return widths
+
+
+def render_variants(file):
+    """Копии фотографии: список словарей preset, format, width, height, content.
+
+    Не обращается к БД, поэтому подходит для отдельных процессов.
+    """
+    with open_photo(file) as image:
+        variants = []
+        for preset, width in preset_widths(image.width).items():
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize(
+                (width, height), Image.LANCZOS, reducing_gap=3.0
+            )
+            for format_name, options in FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, **options)
+                variants.append({
+                    'preset': preset,
+                    'format': format_name,
+                    'width': width,
+                    'height': height,
+                    'content': buffer.getvalue(),
+                })
+        return variants
+
+
+def photo_size(file):
+    """Ширина и высота фото с учётом поворота из EXIF (читается только заголовок)"""
+    with Image.open(file) as image:
+        width, height = image.size
+        if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+    return width, height
+
+
+def dominant_color(image):
+    """Самый частый цвет после сведения картинки к 8 цветам, в виде #rrggbb"""
+    small = image.copy()
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=8, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def photo_placeholder(file):
+    """Размеры, основной цвет и data URI превью фотографии"""
+    width, height = photo_size(file)
+    file.seek(0)
+    with open_photo(file, draft_size=(PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8)) as image:
+        color = dominant_color(image)
+        image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, **PLACEHOLDER_OPTIONS)
+    encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return {
+        'photo_width': width,
+        'photo_height': height,
+        'photo_color': color,
+        'photo_placeholder': f'data:image/webp;base64,{encoded}',
+    }
+
+
+def fill_photo_placeholder(mushroom, force=False):
+    """Заполняет размеры и заглушку фото гриба (без сохранения); True, если поля изменились.
+
+    Новая загрузка читается из памяти до записи в хранилище, уже
+    сохранённое фото - только если заглушки ещё нет или force.
+    """
+    photo = mushroom.photo
+    if not photo:
+        values = {'photo_width': None, 'photo_height': None, 'photo_color': '', 'photo_placeholder': ''}
+    elif photo._committed and mushroom.photo_width is not None and not force:
+        return False
+    elif photo._committed and not photo.storage.exists(photo.name):
+        return False
+    else:
+        committed = photo._committed
+        photo.open('rb')
+        try:
+            values = photo_placeholder(photo)
+        except (OSError, Image.DecompressionBombError):
+            return False
+        finally:
+            if committed:
+                photo.close()
+            else:
+                photo.seek(0)
+    changed = any(getattr(mushroom, field) != value for field, value in values.items())
+    for field, value in values.items():
+        setattr(mushroom, field, value)
+    return changed
+
+
+def hash_photo(task):
+    """(id гриба, путь) -> (id гриба, SHA-256 или None, размер файла)"""
+    mushroom_id, path = task
+    try:
+        return mushroom_id, file_hash(path), os.path.getsize(path)
+    except OSError:
+        return mushroom_id, None, 0
+
+
+def render_photo(task):
+    """(хеш, путь) -> (хеш, копии или None, текст ошибки)"""
+    source_hash, path = task
+    try:
+        return source_hash, render_variants(path), None
+    except (OSError, Image.DecompressionBombError) as error:
+        return source_hash, None, str(error)
+
+
+def variant_name(preset, format_name):
+    """Исходное имя копии; хранилище заменит его хешем содержимого"""
+    return f'{VARIANTS_DIR}/{preset}.{EXTENSIONS[format_name]}'
+
+
+def save_variants(mushroom_id, source_hash, variants):
+    """Записывает файлы копий и заменяет ими прежние записи"""
+    from .models import PhotoVariant
+
+    # Прежние записи освобождают свои файлы (сигнал post_delete PhotoVariant)
+    PhotoVariant.objects.filter(mushroom_id=mushroom_id).delete()
+    storage = get_photo_storage()
+    rows = []
+    for variant in variants:
+        name = variant_name(variant['preset'], variant['format'])
+        name = storage.save(name, ContentFile(variant['content']))
+        rows.append(PhotoVariant(
+            mushroom_id=mushroom_id,
+            preset=variant['preset'],
+            format=variant['format'],
+            file=name,
+            width=variant['width'],
+            height=variant['height'],
+            size=len(variant['content']),
+            source_hash=source_hash,
+        ))
+    PhotoVariant.objects.bulk_create(rows)
+    # bulk_create не отправляет post_save, поэтому ссылки учитываем здесь
+    acquire(row.file.name for row in rows)
+    return rows
+
+
+def is_up_to_date(mushroom, source_hash):
+    """Есть ли у гриба полный набор копий текущей фотографии"""
+    variants = list(mushroom.photo_variants.all())
+    return bool(variants) and all(variant.source_hash == source_hash for variant in variants)
+
+
+def generate_variants(mushroom, force=False):
+    """Создаёт копии фотографии гриба, если их нет или фото изменилось"""
+    from .models import PhotoVariant
+
+    if not mushroom.photo:
+        PhotoVariant.objects.filter(mushroom_id=mushroom.id).delete()
+        return []
+    if not mushroom.photo.storage.exists(mushroom.photo.name):
+        # Файл могли удалить с диска; прежние копии оставляем до появления оригинала
+        return []
+    source_hash = file_hash(mushroom.photo)
+    if not force and is_up_to_date(mushroom, source_hash):
+        return list(mushroom.photo_variants.all())
+    mushroom.photo.open('rb')
+    try:
+        variants = render_variants(mushroom.photo)
+    finally:
+        mushroom.photo.close()
+    with transaction.atomic():
+        rows = save_variants(mushroom.id, source_hash, variants)
+    # При первой загрузке нет и удалённых старых копий, отправляющих сигналы: без новой
+    # версии закэшированные страницы так и показывали бы оригинал без srcset
+    catalog_changed()
+    return rows
+
+
+def generate_variants_by_id(mushroom_id):
+    """Копии для гриба по id; гриб мог быть удалён до фиксации транзакции"""
+    from .models import Mushroom
+
+    mushroom = Mushroom.objects.filter(id=mushroom_id).first()
+    if mushroom is not None:
+        generate_variants(mushroom)
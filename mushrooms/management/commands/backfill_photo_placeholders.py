@@ -0,0 +1,47 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from mushrooms.cache import catalog_changed
+from mushrooms.images import PLACEHOLDER_FIELDS, fill_photo_placeholder
+from mushrooms.models import Mushroom
+
+
+class Command(BaseCommand):
+    help = ('Store photo width, height, dominant colour and a tiny base64 placeholder on every '
+            'mushroom so templates can reserve space without opening image files')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересчитать заглушки всех фотографий')
+        parser.add_argument('--batch-size', type=int, default=500, help='Сколько строк обновлять одним запросом')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        changed = []
+        missing = []
+        total = 0
+        for mushroom in Mushroom.objects.only('id', 'russian_name', 'photo', *PLACEHOLDER_FIELDS).iterator():
+            total += 1
+            if fill_photo_placeholder(mushroom, force=options['force']):
+                # Заглушка меняет разметку страниц, поэтому меняется и дата изменения гриба
+                mushroom.updated_at = timezone.now()
+                changed.append(mushroom)
+            elif mushroom.photo and mushroom.photo_width is None:
+                missing.append(mushroom)
+
+        if changed:
+            Mushroom.objects.bulk_update(
+                changed, PLACEHOLDER_FIELDS + ['updated_at'], batch_size=options['batch_size']
+            )
+            catalog_changed()
+
+        for mushroom in missing:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Не удалось прочитать фото гриба «{mushroom.russian_name}»: {mushroom.photo.name}"
+            ))
+        if changed:
+            placeholder_bytes = sum(len(mushroom.photo_placeholder) for mushroom in changed)
+            self.stdout.write(f"   Заглушки в среднем: {placeholder_bytes / len(changed):.0f} байт")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Проверено грибов: {total}, обновлено: {len(changed)}, без файла: {len(missing)} "
+            f"({time.perf_counter() - started:.1f} с)"
+        ))
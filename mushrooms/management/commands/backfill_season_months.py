@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from mushrooms.cache import catalog_changed
+from mushrooms.models import Mushroom
+from mushrooms.seasons import parse_season
+
+class Command(BaseCommand):
+    help = 'Parse Mushroom.season into the month bitmask used by "fruiting now" queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Сколько строк обновлять одним запросом')
+
+    def handle(self, *args, **options):
+        changed = []
+        unparsed = []
+        total = 0
+        for mushroom in Mushroom.objects.only('id', 'russian_name', 'season', 'season_months', 'updated_at').iterator():
+            total += 1
+            mask = parse_season(mushroom.season)
+            if not mask and mushroom.season.strip():
+                unparsed.append(mushroom)
+            if mask != mushroom.season_months:
+                mushroom.season_months = mask
+                # Месяцы меняют списки «плодоносят сейчас», поэтому меняется и дата изменения гриба
+                mushroom.updated_at = timezone.now()
+                changed.append(mushroom)
+
+        if changed:
+            Mushroom.objects.bulk_update(
+                changed, ['season_months', 'updated_at'], batch_size=options['batch_size']
+            )
+            catalog_changed()
+
+        for mushroom in unparsed:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Не удалось разобрать сезон «{mushroom.season}» у гриба «{mushroom.russian_name}»"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Проверено грибов: {total}, обновлено: {len(changed)}, без месяцев: {len(unparsed)}"
+        ))
@@ -0,0 +1,174 @@
+import json
+import random
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from mushrooms.identifier import get_identifier_index, invalidate_identifier_index
+from mushrooms.models import Mushroom, Characteristic
+from mushrooms.views import calculate_match_percentage, find_matching_mushrooms
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def summarize(latencies, queries):
+    """Сводка по сценарию: перцентили задержки (мс) и число запросов к БД"""
+    return {
+        'runs': len(latencies),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p90_ms': round(percentile(latencies, 90), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'max_ms': round(max(latencies), 3) if latencies else 0.0,
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'queries_max': max(queries) if queries else 0,
+    }
+
+class Command(BaseCommand):
+    help = 'Benchmark identifier, detail and gallery pages on the current catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Запросов на сценарий')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел')
+        parser.add_argument('--max-answers', type=int, default=4, help='Максимум ответов в запросе определителя')
+        parser.add_argument('--output', help='Файл для результатов в JSON (по умолчанию в каталоге benchmarks/ проекта)')
+        parser.add_argument('--compare', help='Предыдущий JSON для сравнения')
+        parser.add_argument('--skip-gallery', action='store_true', help='Не измерять галерею')
+
+    def handle(self, *args, **options):
+        mushroom_ids = list(Mushroom.objects.values_list('id', flat=True))
+        characteristics = list(Characteristic.objects.prefetch_related('characteristicoption_set'))
+        if not mushroom_ids:
+            raise CommandError('Каталог пуст. Сначала выполните generate_synthetic_catalog.')
+
+        self.rng = random.Random(options['seed'])
+        self.client = Client()
+        self.answer_pool = [
+            (characteristic.id, [option.value for option in characteristic.characteristicoption_set.all()])
+            for characteristic in characteristics
+            if characteristic.characteristicoption_set.all()
+        ]
+        requests_count = options['requests']
+        self.stdout.write(f"⏱️ Замеры на каталоге из {len(mushroom_ids)} грибов, {requests_count} запросов на сценарий...")
+
+        # Построение индекса измеряется отдельно от запросов
+        invalidate_identifier_index()
+        started = time.perf_counter()
+        get_identifier_index()
+        index_build_ms = (time.perf_counter() - started) * 1000
+
+        answer_sets = [self.random_answers(options['max_answers']) for _ in range(requests_count)]
+        scenarios = {}
+
+        scenarios['identifier_post_cold'] = self.measure(
+            [('post', '/identifier/', answers) for answers in answer_sets], clear_cache=True
+        )
+        # Тёплый кэш: те же наборы ответов повторяются после прогрева
+        scenarios['identifier_post_warm'] = self.measure(
+            [('post', '/identifier/', answers) for answers in answer_sets], warmup=True
+        )
+        detail_ids = [self.rng.choice(mushroom_ids) for _ in range(requests_count)]
+        scenarios['mushroom_detail'] = self.measure(
+            [('get', f'/mushroom/{mushroom_id}/', None) for mushroom_id in detail_ids], clear_cache=True
+        )
+        if not options['skip_gallery']:
+            scenarios['gallery'] = self.measure(
+                [('get', '/gallery/', None)] * max(requests_count // 10, 1), clear_cache=True
+            )
+        scenarios['find_matching_mushrooms'] = self.measure_function(
+            lambda answers: list(find_matching_mushrooms(self.as_options(answers))), answer_sets
+        )
+        sample = list(Mushroom.objects.filter(id__in=detail_ids))
+        scenarios['calculate_match_percentage'] = self.measure_function(
+            lambda answers: [calculate_match_percentage(m, self.as_options(answers)) for m in sample],
+            answer_sets,
+        )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'catalog_size': len(mushroom_ids),
+            'characteristics': len(characteristics),
+            'requests_per_scenario': requests_count,
+            'index_build_ms': round(index_build_ms, 3),
+            'scenarios': scenarios,
+        }
+        self.print_report(report)
+
+        if options['output']:
+            output = Path(options['output'])
+        else:
+            output = Path(settings.BASE_DIR) / 'benchmarks' / (
+                f"benchmark_{len(mushroom_ids)}_{timezone.now():%Y%m%d_%H%M%S}.json"
+            )
+            output.parent.mkdir(exist_ok=True)
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"✅ Результаты сохранены в {output}"))
+
+        if options['compare']:
+            self.compare(report, json.loads(Path(options['compare']).read_text(encoding='utf-8')))
+
+    def random_answers(self, max_answers):
+        count = self.rng.randint(1, min(max_answers, len(self.answer_pool)))
+        return {
+            f'char_{characteristic_id}': self.rng.choice(values)
+            for characteristic_id, values in self.rng.sample(self.answer_pool, count)
+        }
+
+    def as_options(self, answers):
+        return {key.replace('char_', ''): value for key, value in answers.items()}
+
+    def measure(self, requests, clear_cache=False, warmup=False):
+        latencies, queries = [], []
+        if warmup:
+            for method, url, data in requests:
+                getattr(self.client, method)(url, data or {})
+        for method, url, data in requests:
+            if clear_cache:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(url, data or {})
+                latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{method.upper()} {url} вернул {response.status_code}')
+            queries.append(len(captured))
+        return summarize(latencies, queries)
+
+    def measure_function(self, func, answer_sets):
+        latencies, queries = [], []
+        for answers in answer_sets:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                func(answers)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        return summarize(latencies, queries)
+
+    def print_report(self, report):
+        self.stdout.write(f"   Построение индекса: {report['index_build_ms']} мс")
+        self.stdout.write(f"   {'сценарий':<28} {'p50':>9} {'p90':>9} {'p99':>9} {'запросов':>9}")
+        for name, stats in report['scenarios'].items():
+            self.stdout.write(
+                f"   {name:<28} {stats['p50_ms']:>9} {stats['p90_ms']:>9} {stats['p99_ms']:>9} {stats['queries_mean']:>9}"
+            )
+
+    def compare(self, report, previous):
+        self.stdout.write(f"📊 Сравнение с прогоном от {previous.get('created_at')} "
+                          f"({previous.get('catalog_size')} грибов):")
+        for name, stats in report['scenarios'].items():
+            before = previous.get('scenarios', {}).get(name)
+            if not before or not before['p50_ms']:
+                continue
+            change = (stats['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+            self.stdout.write(f"   {name:<28} p50 {before['p50_ms']} → {stats['p50_ms']} мс ({change:+.1f}%)")
@@ -0,0 +1,103 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from mushrooms.cache import catalog_changed
+from mushrooms.images import hash_photo, is_up_to_date, render_photo, save_variants
+from mushrooms.models import Mushroom
+
+
+def available_cpus():
+    """Ядра, доступные процессу (с учётом ограничений контейнера)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class Command(BaseCommand):
+    help = ('Generate missing resized WebP/JPEG variants for every mushroom photo in parallel; '
+            'photos whose content hash is unchanged are skipped')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=available_cpus(), help='Число процессов')
+        parser.add_argument('--force', action='store_true', help='Пересоздать копии всех фотографий')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        mushrooms = {
+            mushroom.id: mushroom
+            for mushroom in Mushroom.objects.exclude(photo='').exclude(photo__isnull=True)
+            .prefetch_related('photo_variants')
+        }
+        workers = max(options['workers'], 1)
+        self.stdout.write(f"🖼️ Проверяем фотографии: {len(mushrooms)} ({workers} процессов)...")
+
+        # Перед запуском процессов закрываем соединения, чтобы они не унаследовались
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            tasks = [(mushroom.id, mushroom.photo.path) for mushroom in mushrooms.values()]
+            hashes = {}
+            sizes = {}
+            missing = []
+            for mushroom_id, source_hash, size in executor.map(hash_photo, tasks, chunksize=8):
+                if source_hash is None:
+                    missing.append(mushrooms[mushroom_id])
+                else:
+                    hashes[mushroom_id] = source_hash
+                    sizes[mushroom_id] = size
+
+            pending = {
+                mushroom_id: source_hash for mushroom_id, source_hash in hashes.items()
+                if options['force'] or not is_up_to_date(mushrooms[mushroom_id], source_hash)
+            }
+            # Одинаковые файлы (повторные загрузки) обрабатываются один раз
+            paths = {}
+            for mushroom_id, source_hash in pending.items():
+                paths.setdefault(source_hash, mushrooms[mushroom_id].photo.path)
+
+            render_started = time.perf_counter()
+            rendered, errors = {}, []
+            futures = [executor.submit(render_photo, (source_hash, path)) for source_hash, path in paths.items()]
+            for future in as_completed(futures):
+                source_hash, variants, error = future.result()
+                if error:
+                    errors.append(f'{paths[source_hash]}: {error}')
+                else:
+                    rendered[source_hash] = variants
+            render_elapsed = time.perf_counter() - render_started
+
+        original_bytes = card_bytes = variant_bytes = saved_count = 0
+        for mushroom_id, source_hash in pending.items():
+            variants = rendered.get(source_hash)
+            if variants is None:
+                continue
+            with transaction.atomic():
+                save_variants(mushroom_id, source_hash, variants)
+            saved_count += 1
+            original_bytes += sizes[mushroom_id]
+            variant_bytes += sum(len(variant['content']) for variant in variants)
+            card_bytes += min(len(variant['content']) for variant in variants)
+        if saved_count:
+            catalog_changed()
+
+        elapsed = time.perf_counter() - started
+        rate = len(rendered) / render_elapsed if render_elapsed > 0 else 0.0
+        self.stdout.write(
+            f"   Без изменений: {len(hashes) - len(pending)}, обновлено: {saved_count}, "
+            f"обработано файлов: {len(rendered)} ({rate:.1f} изобр./с)"
+        )
+        if saved_count:
+            self.stdout.write(
+                f"   Оригиналы: {original_bytes / 1024 / 1024:.1f} МБ, все копии: {variant_bytes / 1024 / 1024:.1f} МБ, "
+                f"карточки: {card_bytes / 1024 / 1024:.1f} МБ "
+                f"(экономия на карточке {(original_bytes - card_bytes) / 1024 / 1024:.1f} МБ, "
+                f"{100 * (1 - card_bytes / original_bytes):.0f}%)"
+            )
+        for mushroom in missing:
+            self.stdout.write(self.style.WARNING(
+                f"   ⚠️ Нет файла фотографии у гриба «{mushroom.russian_name}»: {mushroom.photo.name}"
+            ))
+        for error in errors:
+            self.stdout.write(self.style.WARNING(f"   ⚠️ {error}"))
+        self.stdout.write(self.style.SUCCESS(f"✅ Готово за {elapsed:.1f} с"))
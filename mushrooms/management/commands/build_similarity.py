@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from mushrooms.identifier import get_identifier_index
+from mushrooms.similarity import build_similarity, get_similar_count
+
+class Command(BaseCommand):
+    help = 'Rebuild the table of similar mushrooms from characteristic vectors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, help='Сколько похожих грибов хранить (по умолчанию SIMILAR_MUSHROOMS_COUNT)')
+
+    def handle(self, *args, **options):
+        top_n = options['top'] or get_similar_count()
+        index = get_identifier_index()
+        self.stdout.write(f"🔗 Считаем сходство {len(index.mushroom_ids)} грибов, по {top_n} соседей...")
+
+        started = time.perf_counter()
+        rows = build_similarity(top_n)
+        elapsed = time.perf_counter() - started
+
+        if not rows:
+            self.stdout.write(self.style.WARNING("   Нет грибов с заполненными характеристиками"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"✅ Сохранено пар похожих грибов: {rows} за {elapsed:.1f} с"))
@@ -0,0 +1,177 @@
+import os
+import posixpath
+import unicodedata
+from collections import Counter
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from mushrooms.cache import catalog_changed
+from mushrooms.models import Mushroom, PhotoVariant, StoredFile
+from mushrooms.storage import get_photo_storage, is_content_addressed, legacy_index
+
+PHOTOS_DIR = 'mushrooms'
+
+
+class Command(BaseCommand):
+    help = ('Recount references to photo files, optionally move legacy photos (including files '
+            'with mojibake names) into content-addressed storage, and delete files that nothing references')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Сколько часов файл без ссылок хранится до удаления')
+        parser.add_argument('--adopt', action='store_true',
+                            help='Переименовать старые фотографии по хешу содержимого')
+        parser.add_argument('--delete-untracked', action='store_true',
+                            help='Удалять и старые файлы вне учёта, на которые нет ссылок')
+
+    def handle(self, *args, **options):
+        storage = get_photo_storage()
+        dry_run = options['dry_run']
+        started = timezone.now()
+        cutoff = started - timedelta(hours=options['grace_hours'])
+
+        if options['adopt']:
+            self.adopt(storage, dry_run)
+
+        references = Counter(
+            name for name in Mushroom.objects.exclude(photo='').exclude(photo__isnull=True)
+            .values_list('photo', flat=True)
+        )
+        references.update(PhotoVariant.objects.values_list('file', flat=True))
+        stored = {item.name: item for item in StoredFile.objects.all()}
+        self.stdout.write(f"🗂️ Файлов со ссылками: {len(references)}, в учёте: {len(stored)}")
+
+        if not dry_run:
+            self.recount(storage, references, stored, started)
+
+        # Файлы из учёта, ссылки на которые пропали раньше срока выдержки
+        orphans = []
+        for name, item in stored.items():
+            if references[name]:
+                continue
+            released_at = item.released_at or started
+            if released_at <= cutoff:
+                orphans.append(name)
+        # Файлы на диске вне учёта: старые загрузки, в том числе с искажёнными именами.
+        # Они могут оказаться единственной копией фото, поэтому удаляются только по явному флагу
+        untracked = [
+            name for name in self.walk(storage, PHOTOS_DIR)
+            if name not in references and name not in stored and self.modified(storage, name) <= cutoff
+        ]
+        if options['delete_untracked']:
+            orphans.extend(untracked)
+        elif untracked:
+            untracked_size = sum(storage.size(name) for name in untracked)
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Файлов вне учёта без ссылок: {len(untracked)} ({untracked_size / 1024 / 1024:.1f} МБ). "
+                f"Проверьте их (--adopt находит фото с искажёнными именами) и удалите с --delete-untracked"
+            ))
+
+        removed = freed = 0
+        for name in sorted(orphans):
+            size = storage.size(name) if storage.exists(name) else 0
+            if not dry_run and not self.delete_orphan(storage, name, started):
+                self.stdout.write(f"   ↩️ {name}: появилась ссылка, файл оставлен")
+                continue
+            removed += 1
+            freed += size
+            self.stdout.write(f"   🗑️ {name} ({size / 1024:.0f} КБ)")
+
+        if not dry_run:
+            self.remove_empty_dirs(storage.path(PHOTOS_DIR))
+        verb = 'Будет удалено' if dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {verb} файлов: {removed}, освобождено {freed / 1024 / 1024:.1f} МБ"
+        ))
+
+    def delete_orphan(self, storage, name, started):
+        """Удаляет файл, если на него по-прежнему нет ссылок; False, если ссылка появилась после проверки"""
+        with transaction.atomic():
+            item = StoredFile.objects.select_for_update().filter(name=name).first()
+            if item is not None and item.ref_count:
+                return False
+            if Mushroom.objects.filter(photo=name).exists() or PhotoVariant.objects.filter(file=name).exists():
+                return False
+            # Хранилище обновляет время изменения, когда тот же файл загружают снова
+            if storage.exists(name) and self.modified(storage, name) >= started:
+                return False
+            storage.delete(name)
+            if item is not None:
+                item.delete()
+        return True
+
+    def adopt(self, storage, dry_run):
+        """Переносит фотографии и копии со старыми именами в хранилище по хешу.
+
+        Если файла с именем из БД нет, он ищется среди файлов с искажёнными
+        именами (см. storage.repaired_names).
+        """
+        on_disk = [name for name in self.walk(storage, PHOTOS_DIR) if not is_content_addressed(name)]
+        index = legacy_index(on_disk)
+        adopted = repaired = missing = 0
+        for model, field in ((Mushroom, 'photo'), (PhotoVariant, 'file')):
+            rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            for row_id, name in rows.values_list('id', field):
+                if is_content_addressed(name):
+                    continue
+                source = name if storage.exists(name) else index.get(unicodedata.normalize('NFC', name))
+                if source is None:
+                    missing += 1
+                    self.stdout.write(self.style.WARNING(f"   ⚠️ Нет файла: {name}"))
+                    continue
+                adopted += 1
+                if source != name:
+                    repaired += 1
+                    self.stdout.write(f"   🔤 {name} ← {source}")
+                if dry_run:
+                    continue
+                with storage.open(source, 'rb') as content:
+                    new_name = storage.save(name, content)
+                changes = {field: new_name}
+                if model is Mushroom:
+                    # Адрес фото меняется, поэтому меняется и отпечаток страниц гриба
+                    changes['updated_at'] = timezone.now()
+                with transaction.atomic():
+                    model.objects.filter(id=row_id).update(**changes)
+        if adopted and not dry_run:
+            catalog_changed()
+        self.stdout.write(
+            f"📦 Переименовано по хешу: {adopted} (из них по искажённому имени: {repaired}), без файла: {missing}"
+        )
+
+    def recount(self, storage, references, stored, now):
+        """Приводит число ссылок в учёте к фактическому"""
+        created = []
+        for name, count in references.items():
+            item = stored.get(name)
+            if item is None:
+                created.append(StoredFile(
+                    name=name, ref_count=count, size=storage.size(name) if storage.exists(name) else 0,
+                ))
+            elif item.ref_count != count or item.released_at is not None:
+                StoredFile.objects.filter(id=item.id).update(ref_count=count, released_at=None)
+        StoredFile.objects.bulk_create(created)
+        for name, item in stored.items():
+            if not references[name] and (item.ref_count or item.released_at is None):
+                item.released_at = item.released_at or now
+                StoredFile.objects.filter(id=item.id).update(ref_count=0, released_at=item.released_at)
+
+    def modified(self, storage, name):
+        return datetime.fromtimestamp(os.path.getmtime(storage.path(name)), tz=timezone.utc)
+
+    def walk(self, storage, directory):
+        """Все файлы каталога хранилища (пути относительно MEDIA_ROOT)"""
+        if not storage.exists(directory):
+            return
+        directories, files = storage.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for name in directories:
+            yield from self.walk(storage, posixpath.join(directory, name))
+
+    def remove_empty_dirs(self, root):
+        for path, directories, files in os.walk(root, topdown=False):
+            if path != str(root) and not os.listdir(path):
+                os.rmdir(path)
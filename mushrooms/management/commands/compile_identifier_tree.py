@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from mushrooms.decision_tree import compile_tree, get_tree_path, save_tree, tree_stats
+from mushrooms.identifier import IdentifierIndex
+
+class Command(BaseCommand):
+    help = 'Compile identifier characteristics into a serialized decision tree'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Путь к файлу дерева (по умолчанию IDENTIFIER_TREE_PATH)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("🌳 Компилируем дерево решений определителя...")
+
+        index = IdentifierIndex.build()
+        if not index.mushroom_ids:
+            self.stdout.write(self.style.WARNING("   В базе нет грибов - дерево не создано"))
+            return
+
+        tree = compile_tree(index)
+        path = options['output'] or get_tree_path()
+        digest = save_tree(index, tree, path)
+        stats = tree_stats(tree)
+
+        self.stdout.write(f"   Грибов: {len(index.mushroom_ids)}, характеристик: {len(index.characteristics)}")
+        self.stdout.write(f"   Максимальная глубина (вопросов в худшем случае): {stats['max_depth']}")
+        self.stdout.write(f"   Минимальная глубина: {stats['min_depth']}")
+        self.stdout.write(f"   Средняя глубина на гриб: {stats['avg_depth']}")
+        self.stdout.write(f"   Листьев: {stats['leaves']}, неразличимых групп: {stats['ambiguous_leaves']} "
+                          f"(крупнейшая - {stats['largest_leaf']} гриб.)")
+        self.stdout.write(f"   Сбалансированность (мин/макс глубина): {stats['balance']}")
+        self.stdout.write(f"   Хеш содержимого: {digest}")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Дерево сохранено в {path}"))
@@ -0,0 +1,79 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from mushrooms.static_export import (
+    collect_pages, copy_media, copy_static, init_worker, read_manifest, remove_stale,
+    render_page, templates_hash, write_manifest,
+)
+
+class Command(BaseCommand):
+    help = ('Pre-render public atlas pages into a static HTML tree; '
+            'identifier and quiz requests are left to Django')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Каталог выгрузки')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Число процессов рендеринга')
+        parser.add_argument('--dynamic-url', default='',
+                            help='Адрес Django для определителя и квизов, если статика на другом домене')
+        parser.add_argument('--force', action='store_true', help='Перерендерить все страницы')
+
+    def handle(self, *args, **options):
+        output_dir = Path(options['output']).resolve()
+        if output_dir == Path(settings.BASE_DIR).resolve():
+            raise CommandError('Выгрузка в каталог проекта перезапишет его файлы')
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        started = time.perf_counter()
+        pages = collect_pages()
+        # Прежний манифест нужен и с --force: по нему находятся страницы, которых больше нет
+        stored = read_manifest(output_dir)
+        previous = {} if options['force'] else stored
+        extra = f"{templates_hash()}|{options['dynamic_url']}"
+        self.stdout.write(f"🗂️ Выгружаем {len(pages)} страниц в {output_dir} ({options['workers']} процессов)...")
+
+        links = {url: path for url, (path, _, _) in pages.items()}
+        tasks = [
+            (url, path, kind, mushroom_id, previous.get(url, {}).get('fingerprint'), extra)
+            for url, (path, kind, mushroom_id) in pages.items()
+        ]
+        # Перед запуском процессов закрываем соединения, чтобы они не унаследовались
+        from django.db import connections
+        connections.close_all()
+
+        manifest, rendered, skipped, errors = {}, 0, 0, []
+        with ProcessPoolExecutor(
+            max_workers=max(options['workers'], 1),
+            initializer=init_worker,
+            initargs=(os.environ['DJANGO_SETTINGS_MODULE'], str(output_dir), links, options['dynamic_url']),
+        ) as executor:
+            for url, path, fingerprint, status in executor.map(render_page, tasks, chunksize=16):
+                if status == 'rendered':
+                    rendered += 1
+                elif status == 'skipped':
+                    skipped += 1
+                else:
+                    errors.append(f'{url}: {status}')
+                    # Последняя удачная выгрузка страницы остаётся на месте и в манифесте
+                    if url in stored:
+                        manifest[url] = stored[url]
+                    continue
+                manifest[url] = {'path': path, 'fingerprint': fingerprint}
+
+        # Устаревшие - выгруженные раньше страницы, которых нет среди текущих страниц сайта
+        current_paths = {path for path, _, _ in pages.values()}
+        stale = {entry['path'] for entry in stored.values()} - current_paths
+        remove_stale(output_dir, stale)
+        write_manifest(output_dir, manifest)
+
+        static_count = copy_static(output_dir)
+        media_count = copy_media(output_dir)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"   Отрендерено: {rendered}, без изменений: {skipped}, удалено: {len(stale)}")
+        self.stdout.write(f"   Скопировано файлов статики: {static_count}, медиа: {media_count}")
+        for error in errors:
+            self.stdout.write(self.style.WARNING(f"   ⚠️ {error}"))
+        self.stdout.write(self.style.SUCCESS(f"✅ Выгрузка завершена за {elapsed:.1f} с"))
@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from mushrooms.duplicates import DEFAULT_DISTANCE, HASH_KINDS, duplicate_clusters, update_photo_hashes
+from mushrooms.models import Mushroom
+
+
+class Command(BaseCommand):
+    help = ('Compute perceptual hashes (dHash, pHash) of mushroom photos and report groups of '
+            'duplicate or near-duplicate photos within a Hamming distance')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--distance', type=int, default=DEFAULT_DISTANCE,
+                            help='Наибольшее расстояние Хэмминга между хешами (из 64 бит)')
+        parser.add_argument('--hash', choices=HASH_KINDS, default='phash', help='Какой хеш сравнивать')
+        parser.add_argument('--force', action='store_true', help='Пересчитать хеши всех фотографий')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        mushrooms = Mushroom.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not options['force']:
+            mushrooms = mushrooms.filter(photo_phash='')
+        self.stdout.write(f"🔍 Считаем перцептивные хеши: {mushrooms.count()} фото...")
+
+        updated = missing = 0
+        for mushroom in mushrooms.iterator():
+            if update_photo_hashes(mushroom, force=options['force']):
+                updated += 1
+            if not mushroom.photo_phash:
+                missing += 1
+        self.stdout.write(f"   Обновлено: {updated}, без файла: {missing} ({time.perf_counter() - started:.1f} с)")
+
+        clusters = duplicate_clusters(options['hash'], options['distance'])
+        for number, cluster in enumerate(clusters, 1):
+            self.stdout.write(f"\n🖼️ Группа {number}:")
+            for mushroom in cluster:
+                self.stdout.write(f"   #{mushroom.id} {mushroom.russian_name}: {mushroom.photo.name}")
+        message = f"✅ Групп похожих фото: {len(clusters)} ({options['hash']}, расстояние ≤ {options['distance']})"
+        self.stdout.write(self.style.SUCCESS(f"\n{message}") if clusters else self.style.SUCCESS(message))
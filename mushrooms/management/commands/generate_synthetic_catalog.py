@@ -0,0 +1,150 @@
+import random
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from mushrooms.cache import catalog_changed
+from mushrooms.districts import rebuild_districts
+from mushrooms.identifier import invalidate_identifier_index
+from mushrooms.search import is_available, rebuild_index
+from mushrooms.seasons import parse_season
+from mushrooms.models import Mushroom, Lookalike, Characteristic, MushroomCharacteristic
+
+# Синтетические грибы помечаются префиксом латинского названия
+SYNTHETIC_PREFIX = 'Synthetica'
+
+# Доли типов и съедобности, близкие к региональным атласам
+TYPE_WEIGHTS = {'lamellar': 0.6, 'tubular': 0.25, 'other': 0.15}
+EDIBILITY_WEIGHTS = {
+    'edible': 0.3,
+    'conditionally_edible': 0.2,
+    'inedible': 0.35,
+    'poisonous': 0.12,
+    'deadly': 0.03,
+}
+MONTHS = [
+    'январь', 'февраль', 'март', 'апрель', 'май', 'июнь',
+    'июль', 'август', 'сентябрь', 'октябрь', 'ноябрь', 'декабрь',
+]
+DANGER_BY_EDIBILITY = {
+    'deadly': 'deadly',
+    'poisonous': 'high',
+    'inedible': 'medium',
+    'conditionally_edible': 'low',
+    'edible': 'low',
+}
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic mushroom catalog for identifier benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1000, help='Количество синтетических грибов')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел')
+        parser.add_argument('--lookalikes', type=int, default=3, help='Максимум двойников у гриба')
+        parser.add_argument('--missing', type=float, default=0.1,
+                            help='Доля незаполненных характеристик')
+        parser.add_argument('--clear', action='store_true',
+                            help='Только удалить ранее созданные синтетические грибы')
+
+    def handle(self, *args, **options):
+        deleted = self.clear_synthetic()
+        if deleted:
+            self.stdout.write(f"🧹 Удалено синтетических грибов: {deleted}")
+        if options['clear']:
+            self.finish()
+            return
+
+        characteristics = list(Characteristic.objects.prefetch_related('characteristicoption_set'))
+        if not characteristics:
+            raise CommandError('Нет характеристик. Сначала выполните load_mushroom_identifier.')
+
+        rng = random.Random(options['seed'])
+        size = options['size']
+        self.stdout.write(f"🧪 Генерируем синтетический каталог из {size} грибов...")
+
+        with transaction.atomic():
+            mushrooms = self.create_mushrooms(rng, size)
+            chars_count = self.create_characteristics(rng, mushrooms, characteristics, options['missing'])
+            lookalikes_count = self.create_lookalikes(rng, mushrooms, options['lookalikes'])
+
+        self.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Создано грибов: {len(mushrooms)}, характеристик: {chars_count}, двойников: {lookalikes_count}"
+        ))
+
+    def clear_synthetic(self):
+        deleted, details = Mushroom.objects.filter(latin_name__startswith=SYNTHETIC_PREFIX).delete()
+        return details.get(Mushroom._meta.label, 0)
+
+    def finish(self):
+        invalidate_identifier_index()
+        rebuild_districts()
+        catalog_changed()
+        if is_available():
+            rebuild_index()
+
+    def create_mushrooms(self, rng, size):
+        types = list(TYPE_WEIGHTS)
+        edibilities = list(EDIBILITY_WEIGHTS)
+        mushrooms = []
+        for number in range(1, size + 1):
+            mushroom_type = rng.choices(types, weights=TYPE_WEIGHTS.values())[0]
+            edibility = rng.choices(edibilities, weights=EDIBILITY_WEIGHTS.values())[0]
+            start_month = rng.randint(4, 8)
+            season = f'{MONTHS[start_month]}-{MONTHS[min(start_month + rng.randint(1, 3), 10)]}'
+            # bulk_create не вызывает save(), поэтому маску месяцев задаём сами
+            mushrooms.append(Mushroom(
+                russian_name=f'Синтетический гриб {number:06d}',
+                latin_name=f'{SYNTHETIC_PREFIX} {mushroom_type} {number:06d}',
+                mushroom_type=mushroom_type,
+                edibility=edibility,
+                description='Синтетический гриб для нагрузочного тестирования определителя. ' * 5,
+                habitat='Смешанные леса',
+                season=season,
+                season_months=parse_season(season),
+                distribution='Синтетический район',
+            ))
+        Mushroom.objects.bulk_create(mushrooms, batch_size=500)
+        # Перечитываем, чтобы получить id созданных грибов
+        return list(Mushroom.objects.filter(latin_name__startswith=SYNTHETIC_PREFIX).order_by('id'))
+
+    def create_characteristics(self, rng, mushrooms, characteristics, missing):
+        rows = []
+        for characteristic in characteristics:
+            options = list(characteristic.characteristicoption_set.all())
+            if not options:
+                continue
+            # Частоты вариантов распределены по закону Ципфа:
+            # несколько значений встречаются часто, остальные редко
+            rng.shuffle(options)
+            weights = [1 / rank for rank in range(1, len(options) + 1)]
+            for mushroom in mushrooms:
+                if rng.random() < missing:
+                    continue
+                rows.append(MushroomCharacteristic(
+                    mushroom=mushroom,
+                    characteristic=characteristic,
+                    option=rng.choices(options, weights=weights)[0],
+                ))
+        MushroomCharacteristic.objects.bulk_create(rows, batch_size=500)
+        return len(rows)
+
+    def create_lookalikes(self, rng, mushrooms, max_lookalikes):
+        # Двойников ищем среди грибов того же типа, как в реальных атласах
+        by_type = {}
+        for mushroom in mushrooms:
+            by_type.setdefault(mushroom.mushroom_type, []).append(mushroom)
+
+        rows = []
+        for mushroom in mushrooms:
+            group = by_type[mushroom.mushroom_type]
+            count = rng.randint(0, max_lookalikes)
+            sample = rng.sample(group, min(count + 1, len(group)))
+            for lookalike in [m for m in sample if m.id != mushroom.id][:count]:
+                rows.append(Lookalike(
+                    mushroom=mushroom,
+                    lookalike=lookalike,
+                    danger_level=DANGER_BY_EDIBILITY[lookalike.edibility],
+                    differences='Синтетические отличия',
+                    visual_differences='Синтетические визуальные отличия',
+                ))
+        Lookalike.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+        return len(rows)
@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand
+from mushrooms.districts import district_counts, rebuild_districts
+
+class Command(BaseCommand):
+    help = 'Parse Mushroom.distribution into normalized District records and mushroom-district links'
+
+    def handle(self, *args, **options):
+        self.stdout.write("🗺️ Разбираем районы распространения...")
+        started = time.perf_counter()
+        mushrooms, links, districts = rebuild_districts()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Грибов: {mushrooms}, районов: {districts}, связей: {links} "
+            f"за {time.perf_counter() - started:.1f} с"
+        ))
+        for district in district_counts():
+            self.stdout.write(f"   {district.name}: {district.mushroom_count}")
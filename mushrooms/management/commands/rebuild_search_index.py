@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from mushrooms.search import is_available, rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite FTS5 full-text search index of mushrooms'
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError('Таблица полнотекстового поиска не найдена (нужна SQLite и миграция 0011)')
+
+        self.stdout.write("🔎 Перестраиваем поисковый индекс...")
+        started = time.perf_counter()
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Проиндексировано грибов: {count} за {time.perf_counter() - started:.1f} с"
+        ))
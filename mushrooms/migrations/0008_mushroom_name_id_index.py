@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0007_useranswer'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mushroom',
+            index=models.Index(fields=['russian_name', 'id'], name='mushroom_name_id_idx'),
+        ),
+    ]
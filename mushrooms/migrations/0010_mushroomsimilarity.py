@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MushroomSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('mushroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='mushrooms.mushroom', verbose_name='Гриб')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mushrooms.mushroom', verbose_name='Похожий гриб')),
+            ],
+            options={
+                'verbose_name': 'Похожий гриб',
+                'verbose_name_plural': 'Похожие грибы',
+                'ordering': ['mushroom', 'rank'],
+                'unique_together': {('mushroom', 'rank')},
+            },
+        ),
+    ]
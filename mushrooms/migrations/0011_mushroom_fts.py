@@ -0,0 +1,40 @@
+from django.db import migrations
+
+FTS_TABLE = 'mushrooms_mushroom_fts'
+FTS_COLUMNS = ['russian_name', 'latin_name', 'description', 'habitat', 'key_characteristics']
+
+
+def normalized(column):
+    # Та же замена «ё» на «е», что и search.normalize()
+    return f"replace(replace(coalesce({column}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+def create_fts(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других СУБД поиск работает через icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    columns = ', '.join(FTS_COLUMNS)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, tokenize = 'unicode61 remove_diacritics 0')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {columns}) "
+        f"SELECT id, {', '.join(normalized(column) for column in FTS_COLUMNS)} FROM mushrooms_mushroom"
+    )
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0010_mushroomsimilarity'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
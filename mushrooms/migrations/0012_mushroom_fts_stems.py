@@ -0,0 +1,58 @@
+from django.db import migrations
+
+from mushrooms.stemmer import stem_text
+
+FTS_TABLE = 'mushrooms_mushroom_fts'
+TEXT_COLUMNS = ['russian_name', 'latin_name', 'description', 'habitat', 'key_characteristics']
+STEM_COLUMNS = ['name_stems', 'text_stems']
+
+
+def normalize(text):
+    return (text or '').replace('ё', 'е').replace('Ё', 'Е')
+
+
+def create_table(schema_editor, columns):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({', '.join(columns)}, "
+        f"tokenize = 'unicode61 remove_diacritics 0')"
+    )
+
+
+def add_stems(apps, schema_editor):
+    # Виртуальную таблицу FTS5 нельзя изменить - создаём заново со столбцами основ
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    columns = TEXT_COLUMNS + STEM_COLUMNS
+    create_table(schema_editor, columns)
+    Mushroom = apps.get_model('mushrooms', 'Mushroom')
+    placeholders = ', '.join(['%s'] * (len(columns) + 1))
+    rows = []
+    for mushroom in Mushroom.objects.only('id', *TEXT_COLUMNS).iterator():
+        texts = [normalize(getattr(mushroom, column)) for column in TEXT_COLUMNS]
+        rows.append([mushroom.id] + texts + [stem_text(' '.join(texts[:2])), stem_text(' '.join(texts[2:]))])
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(columns)}) VALUES ({placeholders})", rows
+        )
+
+
+def remove_stems(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    create_table(schema_editor, TEXT_COLUMNS)
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(TEXT_COLUMNS)}) "
+        f"SELECT id, {', '.join(TEXT_COLUMNS)} FROM mushrooms_mushroom"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0011_mushroom_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_stems, remove_stems),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+from mushrooms.seasons import parse_season
+
+
+def fill_season_months(apps, schema_editor):
+    Mushroom = apps.get_model('mushrooms', 'Mushroom')
+    mushrooms = list(Mushroom.objects.only('id', 'season'))
+    for mushroom in mushrooms:
+        mushroom.season_months = parse_season(mushroom.season)
+    Mushroom.objects.bulk_update(mushrooms, ['season_months'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0012_mushroom_fts_stems'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mushroom',
+            name='season_months',
+            field=models.PositiveSmallIntegerField(
+                db_index=True, default=0, editable=False, verbose_name='Месяцы плодоношения'
+            ),
+        ),
+        migrations.RunPython(fill_season_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0013_mushroom_season_months'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='District',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+                ('kind', models.CharField(choices=[('district', 'Район'), ('urban_okrug', 'Городской округ')], max_length=20, verbose_name='Тип')),
+                ('key', models.CharField(max_length=200, unique=True, verbose_name='Ключ')),
+            ],
+            options={
+                'verbose_name': 'Район',
+                'verbose_name_plural': 'Районы',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='mushroom',
+            name='districts',
+            field=models.ManyToManyField(blank=True, related_name='mushrooms', to='mushrooms.district', verbose_name='Районы'),
+        ),
+    ]
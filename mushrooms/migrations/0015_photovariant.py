@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0014_district'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('preset', models.CharField(choices=[('card', 'Карточка'), ('detail', 'Страница гриба'), ('retina', 'Экран высокой плотности')], max_length=20, verbose_name='Размер')),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10, verbose_name='Формат')),
+                ('file', models.FileField(max_length=255, upload_to='', verbose_name='Файл')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('size', models.PositiveIntegerField(verbose_name='Размер файла, байт')),
+                ('source_hash', models.CharField(db_index=True, max_length=64, verbose_name='Хеш исходного файла')),
+                ('mushroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_variants', to='mushrooms.mushroom', verbose_name='Гриб')),
+            ],
+            options={
+                'verbose_name': 'Копия фотографии',
+                'verbose_name_plural': 'Копии фотографий',
+                'ordering': ['mushroom', 'format', 'width'],
+                'unique_together': {('mushroom', 'preset', 'format')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:20
+
+from django.db import migrations, models
+import mushrooms.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0015_photovariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Путь')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Размер файла, байт')),
+                ('ref_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Число ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('released_at', models.DateTimeField(blank=True, null=True, verbose_name='Без ссылок с')),
+            ],
+            options={
+                'verbose_name': 'Файл фотографии',
+                'verbose_name_plural': 'Файлы фотографий',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='mushroom',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=mushrooms.storage.get_photo_storage, upload_to='mushrooms/', verbose_name='Фото'),
+        ),
+        migrations.AlterField(
+            model_name='photovariant',
+            name='file',
+            field=models.FileField(max_length=255, storage=mushrooms.storage.get_photo_storage, upload_to='', verbose_name='Файл'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0016_stored_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mushroom',
+            name='photo_dhash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=16, verbose_name='dHash фото'),
+        ),
+        migrations.AddField(
+            model_name='mushroom',
+            name='photo_phash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=16, verbose_name='pHash фото'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0017_photo_perceptual_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mushroom',
+            name='photo_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет фото'),
+        ),
+        migrations.AddField(
+            model_name='mushroom',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота фото'),
+        ),
+        migrations.AddField(
+            model_name='mushroom',
+            name='photo_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью-заглушка фото'),
+        ),
+        migrations.AddField(
+            model_name='mushroom',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина фото'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:59
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mushrooms', '0018_photo_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='district',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Изменён'),
+            preserve_default=False,
+        ),
+    ]
@@ -1,5 +1,30 @@
 from django.db import models
 
+from .images import PLACEHOLDER_FIELDS, fill_photo_placeholder
+from .seasons import parse_season
+from .storage import get_photo_storage
+
+class District(models.Model):
+    KIND_CHOICES = [
+        ('district', 'Район'),
+        ('urban_okrug', 'Городской округ'),
+    ]
+
+    name = models.CharField(max_length=200, verbose_name="Название")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Тип")
+    # Нормализованное название для сопоставления разных написаний
+    key = models.CharField(max_length=200, unique=True, verbose_name="Ключ")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменён")
+
+    class Meta:
+        verbose_name = "Район"
+        verbose_name_plural = "Районы"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class Mushroom(models.Model):
     MUSHROOM_TYPES = [
         ('tubular', 'Трубчатые'),
@@ -22,13 +47,32 @@ class Mushroom(models.Model):
     description = models.TextField(verbose_name="Описание")
     habitat = models.TextField(verbose_name="Место обитания")
     season = models.CharField(max_length=100, verbose_name="Сезон")
+    # Месяцы плодоношения битовой маской (бит 0 - январь), заполняется из season при сохранении
+    season_months = models.PositiveSmallIntegerField(
+        default=0, db_index=True, editable=False, verbose_name="Месяцы плодоношения"
+    )
     distribution = models.TextField(blank=True, verbose_name="Распространение")
-    photo = models.ImageField(upload_to='mushrooms/', blank=True, null=True, verbose_name="Фото")
+    # Заполняется из distribution (см. districts.py)
+    districts = models.ManyToManyField(
+        District, blank=True, related_name='mushrooms', verbose_name="Районы"
+    )
+    photo = models.ImageField(
+        upload_to='mushrooms/', storage=get_photo_storage, blank=True, null=True, verbose_name="Фото"
+    )
+    # Размеры фото, основной цвет и превью в base64: заполняются при сохранении (см. images.py)
+    photo_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Ширина фото")
+    photo_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Высота фото")
+    photo_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name="Основной цвет фото")
+    photo_placeholder = models.TextField(blank=True, editable=False, verbose_name="Превью-заглушка фото")
+    # Перцептивные хеши фотографии (64 бита в hex) для поиска повторов, см. duplicates.py
+    photo_dhash = models.CharField(max_length=16, blank=True, db_index=True, editable=False, verbose_name="dHash фото")
+    photo_phash = models.CharField(max_length=16, blank=True, db_index=True, editable=False, verbose_name="pHash фото")
 
     # Новые поля для определителя
     key_characteristics = models.TextField(blank=True, verbose_name="Ключевые характеристики")
     warning = models.TextField(blank=True, verbose_name="Предупреждение")
     cooking_tips = models.TextField(blank=True, verbose_name="Советы по приготовлению")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменён")
 
     def get_edibility_color(self):
         colors = {
@@ -39,6 +83,16 @@ class Mushroom(models.Model):
             'inedible': 'secondary',
         }
         return colors.get(self.edibility, 'secondary')
+
+    def save(self, *args, **kwargs):
+        self.season_months = parse_season(self.season)
+        fill_photo_placeholder(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'season' in update_fields:
+            update_fields = kwargs['update_fields'] = set(update_fields) | {'season_months'}
+        if update_fields is not None and 'photo' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(PLACEHOLDER_FIELDS)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return self.russian_name
@@ -47,6 +101,10 @@ class Mushroom(models.Model):
         verbose_name = "Гриб"
         verbose_name_plural = "Грибы"
         ordering = ['russian_name']
+        indexes = [
+            # Ключ курсорной пагинации галереи
+            models.Index(fields=['russian_name', 'id'], name='mushroom_name_id_idx'),
+        ]
 
 
 class Lookalike(models.Model):
@@ -77,6 +135,7 @@ class Lookalike(models.Model):
     differences = models.TextField(verbose_name="Ключевые отличия")
     visual_differences = models.TextField(verbose_name="Визуальные отличия")
     warning = models.TextField(blank=True, verbose_name="Особое предупреждение")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменён")
 
     class Meta:
         verbose_name = "Двойник гриба"
@@ -136,6 +195,7 @@ class MushroomCharacteristic(models.Model):
         on_delete=models.CASCADE,
         verbose_name="Выбранный вариант"
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменена")
     
     class Meta:
         verbose_name = "Характеристика гриба"
@@ -146,6 +206,88 @@ class MushroomCharacteristic(models.Model):
         return f"{self.mushroom.russian_name} - {self.characteristic.name}: {self.option.value}"
 
 
+class PhotoVariant(models.Model):
+    """Уменьшенная копия фотографии гриба (см. images.py)"""
+    PRESET_CHOICES = [
+        ('card', 'Карточка'),
+        ('detail', 'Страница гриба'),
+        ('retina', 'Экран высокой плотности'),
+    ]
+    FORMAT_CHOICES = [
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    mushroom = models.ForeignKey(
+        Mushroom,
+        on_delete=models.CASCADE,
+        related_name='photo_variants',
+        verbose_name="Гриб"
+    )
+    preset = models.CharField(max_length=20, choices=PRESET_CHOICES, verbose_name="Размер")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, verbose_name="Формат")
+    file = models.FileField(max_length=255, storage=get_photo_storage, verbose_name="Файл")
+    width = models.PositiveIntegerField(verbose_name="Ширина")
+    height = models.PositiveIntegerField(verbose_name="Высота")
+    size = models.PositiveIntegerField(verbose_name="Размер файла, байт")
+    # SHA-256 исходной фотографии: копии не пересоздаются, пока она не изменится
+    source_hash = models.CharField(max_length=64, db_index=True, verbose_name="Хеш исходного файла")
+
+    class Meta:
+        verbose_name = "Копия фотографии"
+        verbose_name_plural = "Копии фотографий"
+        ordering = ['mushroom', 'format', 'width']
+        unique_together = ['mushroom', 'preset', 'format']
+
+    def __str__(self):
+        return f"{self.mushroom_id}: {self.preset} {self.format} {self.width}×{self.height}"
+
+
+class StoredFile(models.Model):
+    """Файл хранилища фотографий и число ссылок на него (см. storage.py)"""
+    name = models.CharField(max_length=255, unique=True, verbose_name="Путь")
+    size = models.PositiveIntegerField(default=0, verbose_name="Размер файла, байт")
+    ref_count = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Число ссылок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    # Когда пропала последняя ссылка: cleanup_photos удаляет файл после выдержки
+    released_at = models.DateTimeField(null=True, blank=True, verbose_name="Без ссылок с")
+
+    class Meta:
+        verbose_name = "Файл фотографии"
+        verbose_name_plural = "Файлы фотографий"
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
+class MushroomSimilarity(models.Model):
+    """Ближайшие по характеристикам грибы, рассчитываются заранее (см. similarity.py)"""
+    mushroom = models.ForeignKey(
+        Mushroom,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name="Гриб"
+    )
+    similar = models.ForeignKey(
+        Mushroom,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Похожий гриб"
+    )
+    score = models.FloatField(verbose_name="Сходство")
+    rank = models.PositiveSmallIntegerField(verbose_name="Место")
+
+    class Meta:
+        verbose_name = "Похожий гриб"
+        verbose_name_plural = "Похожие грибы"
+        ordering = ['mushroom', 'rank']
+        unique_together = ['mushroom', 'rank']
+
+    def __str__(self):
+        return f"{self.mushroom_id} → {self.similar_id} ({self.score:.2f})"
+
+
 # Существующие модели Quiz оставляем без изменений, но добавляем verbose_name
 class Quiz(models.Model):
     LEVEL_CHOICES = [
@@ -0,0 +1,210 @@
+"""Полнотекстовый поиск грибов.
+
+На SQLite поиск идёт по виртуальной таблице FTS5 (миграции 0011, 0012) с
+ранжированием BM25 и подсветкой фрагментов. Токенизатор unicode61
+приводит к одному регистру и кириллицу, а «ё» заменяется на «е» при
+индексации и в запросе. Кроме текста в таблице хранятся основы слов
+(stemmer.py), поэтому «груздя» находит «груздь», а «опят» - «опёнок».
+Таблица обновляется сигналами при сохранении и удалении грибов,
+целиком - командой rebuild_search_index. На других СУБД поиск
+откатывается на фильтры icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Mushroom
+from .stemmer import stem, stem_text
+
+FTS_TABLE = 'mushrooms_mushroom_fts'
+TEXT_COLUMNS = ['russian_name', 'latin_name', 'description', 'habitat', 'key_characteristics']
+# Основы слов названий и остального текста
+STEM_COLUMNS = ['name_stems', 'text_stems']
+FTS_COLUMNS = TEXT_COLUMNS + STEM_COLUMNS
+
+# Веса столбцов в BM25: совпадение в названии важнее, чем в описании
+FTS_WEIGHTS = [10.0, 8.0, 1.0, 2.0, 3.0, 8.0, 1.5]
+
+# Поля, из которых берётся фрагмент для выдачи, по порядку
+SNIPPET_FIELDS = ['description', 'habitat', 'key_characteristics']
+SNIPPET_WORDS = 24
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Текст для индекса и запросов: «ё» не отличается от «е»"""
+    return (text or '').replace('ё', 'е').replace('Ё', 'Е')
+
+
+_available = None
+
+
+def is_available():
+    """Есть ли таблица FTS5 в текущей базе (проверяется один раз на процесс)"""
+    global _available
+    if _available is None:
+        _available = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _available
+
+
+def index_row(mushroom):
+    """Строка индекса: нормализованный текст и основы слов"""
+    texts = [normalize(getattr(mushroom, column)) for column in TEXT_COLUMNS]
+    name_stems = stem_text(' '.join(texts[:2]))
+    text_stems = stem_text(' '.join(texts[2:]))
+    return [mushroom.id] + texts + [name_stems, text_stems]
+
+
+def index_mushrooms(mushrooms):
+    """Добавляет или обновляет грибы в поисковом индексе"""
+    rows = [index_row(mushroom) for mushroom in mushrooms]
+    if not rows:
+        return
+    ids = [[row[0]] for row in rows]
+    placeholders = ', '.join(['%s'] * (len(FTS_COLUMNS) + 1))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', ids)
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) VALUES ({placeholders})', rows
+        )
+
+
+def remove_mushroom(mushroom_id):
+    """Удаляет гриб из поискового индекса"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [mushroom_id])
+
+
+def rebuild_index(batch_size=500):
+    """Перестраивает индекс по всем грибам, возвращает их число"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    count = 0
+    mushrooms = Mushroom.objects.only('id', *TEXT_COLUMNS).order_by('id')
+    batch = []
+    for mushroom in mushrooms.iterator(chunk_size=batch_size):
+        batch.append(mushroom)
+        if len(batch) == batch_size:
+            index_mushrooms(batch)
+            count += len(batch)
+            batch = []
+    index_mushrooms(batch)
+    with connection.cursor() as cursor:
+        # Слияние сегментов индекса ускоряет последующие запросы
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return count + len(batch)
+
+
+def build_match_query(query, names_only=False):
+    """Запрос FTS5 из пользовательского ввода.
+
+    Каждое слово ищется по началу в тексте или по основе в столбцах
+    основ; все слова запроса должны найтись. С names_only ищется только
+    в названиях.
+    """
+    if names_only:
+        text_filter, stems_filter = '{russian_name latin_name} : ', 'name_stems : '
+    else:
+        text_filter, stems_filter = '', '{' + ' '.join(STEM_COLUMNS) + '} : '
+    return ' AND '.join(
+        f'({text_filter}"{word}"* OR {stems_filter}"{stem(word)}")'
+        for word in WORD_RE.findall(normalize(query))
+    )
+
+
+def make_snippet(mushroom, query):
+    """Фрагмент текста гриба с подсвеченными словами запроса.
+
+    Слово подсвечивается, если оно начинается со слова запроса или
+    совпадает с ним по основе, поэтому подсветка работает и для других
+    форм слова.
+    """
+    words = tuple(word.lower() for word in WORD_RE.findall(normalize(query)))
+    stems = {stem(word) for word in words}
+
+    def matches(token):
+        return any(
+            part.lower().startswith(words) or stem(part) in stems
+            for part in WORD_RE.findall(normalize(token))
+        )
+
+    fields = [getattr(mushroom, field) or '' for field in SNIPPET_FIELDS]
+    tokens, hits = [], []
+    for text in fields:
+        tokens = text.split()
+        hits = [i for i, token in enumerate(tokens) if matches(token)]
+        if hits:
+            break
+    else:
+        # Совпадение только в названии - показываем начало описания
+        tokens = (fields[0] or next((field for field in fields if field), '')).split()
+
+    start = max(0, hits[0] - SNIPPET_WORDS // 3) if hits else 0
+    window = tokens[start:start + SNIPPET_WORDS]
+    snippet = ' '.join(
+        f'<mark>{escape(token)}</mark>' if matches(token) else escape(token)
+        for token in window
+    )
+    if start > 0:
+        snippet = '…' + snippet
+    if start + SNIPPET_WORDS < len(tokens):
+        snippet += '…'
+    return mark_safe(snippet)
+
+
+def search_mushrooms(query, limit=50):
+    """Грибы по запросу в порядке релевантности.
+
+    У каждого найденного гриба есть атрибут search_snippet с
+    подсвеченным фрагментом текста.
+    """
+    if not is_available():
+        return _search_fallback(query, limit)
+
+    match = build_match_query(query)
+    if not match:
+        return []
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    ids = []
+    with connection.cursor() as cursor:
+        # Сначала грибы, в названии которых есть все слова запроса, затем остальные.
+        # В небольшом каталоге частые слова («гриб») почти не влияют на BM25,
+        # и без этого совпадение в названии могло оказаться ниже совпадения в описании
+        for expression in (build_match_query(query, names_only=True), match):
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+                [expression, limit],
+            )
+            ids.extend(row[0] for row in cursor.fetchall() if row[0] not in ids)
+    ids = ids[:limit]
+
+    mushrooms = Mushroom.objects.prefetch_related('photo_variants').in_bulk(ids)
+    results = []
+    for mushroom_id in ids:
+        mushroom = mushrooms.get(mushroom_id)
+        if mushroom is not None:
+            mushroom.search_snippet = make_snippet(mushroom, query)
+            results.append(mushroom)
+    return results
+
+
+def _search_fallback(query, limit):
+    query = query.strip()
+    if not query:
+        return []
+    mushrooms = Mushroom.objects.filter(
+        Q(russian_name__icontains=query) |
+        Q(latin_name__icontains=query) |
+        Q(description__icontains=query) |
+        Q(habitat__icontains=query) |
+        Q(key_characteristics__icontains=query)
+    ).prefetch_related('photo_variants')[:limit]
+    results = list(mushrooms)
+    for mushroom in results:
+        mushroom.search_snippet = make_snippet(mushroom, query)
+    return results
@@ -0,0 +1,102 @@
+"""Сезон плодоношения в виде битовой маски месяцев.
+
+Поле Mushroom.season - свободный текст («июль-август», «Июль — октябрь»,
+«весь год»). parse_season переводит его в 12-битную маску: бит 0 -
+январь, бит 11 - декабрь. Диапазоны через дефис, тире, «по» и «до»
+разворачиваются во все месяцы между границами, в том числе через
+Новый год («ноябрь-февраль»).
+"""
+import re
+
+from django.utils import timezone
+
+MONTH_NAMES = [
+    'январь', 'февраль', 'март', 'апрель', 'май', 'июнь',
+    'июль', 'август', 'сентябрь', 'октябрь', 'ноябрь', 'декабрь',
+]
+# Название месяца в предложном падеже: «в июле»
+MONTH_NAMES_PREPOSITIONAL = [
+    'январе', 'феврале', 'марте', 'апреле', 'мае', 'июне',
+    'июле', 'августе', 'сентябре', 'октябре', 'ноябре', 'декабре',
+]
+
+# Начала слов, по которым узнаётся месяц в любом падеже
+MONTH_PREFIXES = [
+    ('январ', 1), ('феврал', 2), ('март', 3), ('апрел', 4), ('ма', 5), ('июн', 6),
+    ('июл', 7), ('август', 8), ('сентябр', 9), ('октябр', 10), ('ноябр', 11), ('декабр', 12),
+]
+SEASON_MONTHS = {
+    'весн': [3, 4, 5],
+    'лет': [6, 7, 8],
+    'осен': [9, 10, 11],
+    'зим': [12, 1, 2],
+}
+ALL_MONTHS = (1 << 12) - 1
+
+TOKEN_RE = re.compile(r'[а-яё]+|[-–—]|,|;', re.IGNORECASE)
+RANGE_WORDS = {'-', '–', '—', 'по', 'до'}
+
+
+def month_bit(month):
+    """Бит месяца (1-12) в маске"""
+    return 1 << (month - 1)
+
+
+def month_from_word(word):
+    """Номер месяца по слову или None"""
+    word = word.lower().replace('ё', 'е')
+    if word in ('май', 'мая', 'мае', 'маю', 'маем'):
+        return 5
+    for prefix, month in MONTH_PREFIXES:
+        if prefix != 'ма' and word.startswith(prefix):
+            return month
+    return None
+
+
+def month_range(start, end):
+    """Месяцы от start до end включительно, с переходом через декабрь"""
+    months = [start]
+    while months[-1] != end:
+        months.append(months[-1] % 12 + 1)
+    return months
+
+
+def parse_season(text):
+    """Маска месяцев плодоношения по тексту сезона; 0, если месяцы не найдены"""
+    text = (text or '').lower().replace('ё', 'е')
+    if 'круглый год' in text or 'весь год' in text or 'круглогодично' in text:
+        return ALL_MONTHS
+
+    mask = 0
+    previous = None
+    in_range = False
+    for token in TOKEN_RE.findall(text):
+        if token in RANGE_WORDS:
+            in_range = previous is not None
+            continue
+        month = month_from_word(token)
+        if month is None:
+            for prefix, months in SEASON_MONTHS.items():
+                if token.startswith(prefix):
+                    for season_month in months:
+                        mask |= month_bit(season_month)
+            if token in (',', ';', 'и'):
+                previous, in_range = None, False
+            continue
+        if in_range:
+            for range_month in month_range(previous, month):
+                mask |= month_bit(range_month)
+        else:
+            mask |= month_bit(month)
+        previous, in_range = month, False
+    return mask
+
+
+def months_from_mask(mask):
+    """Номера месяцев, отмеченных в маске"""
+    return [month for month in range(1, 13) if mask & month_bit(month)]
+
+
+def current_month():
+    """Номер текущего месяца в часовом поясе сайта"""
+    return timezone.localdate().month
@@ -0,0 +1,126 @@
+"""Обработчики сигналов: сброс индексов и кэшей при изменении данных о грибах"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .districts import sync_districts
+from .duplicates import update_photo_hashes_by_id
+from .identifier import invalidate_identifier_index
+from .images import generate_variants_by_id
+from .models import (
+    Characteristic, CharacteristicOption, District, Lookalike, Mushroom, MushroomCharacteristic,
+    MushroomSimilarity, PhotoVariant,
+)
+from .search import index_mushrooms, is_available, remove_mushroom
+from .similarity import schedule_similarity_update
+from .storage import acquire, release
+
+
+@receiver([post_save, post_delete], sender=Mushroom)
+@receiver([post_save, post_delete], sender=Characteristic)
+@receiver([post_save, post_delete], sender=CharacteristicOption)
+@receiver([post_save, post_delete], sender=MushroomCharacteristic)
+def reset_identifier_index(sender, **kwargs):
+    """Индекс определителя перестраивается после любого изменения данных"""
+    invalidate_identifier_index()
+
+
+@receiver([post_save, post_delete], sender=Mushroom)
+@receiver([post_save, post_delete], sender=Characteristic)
+@receiver([post_save, post_delete], sender=CharacteristicOption)
+@receiver([post_save, post_delete], sender=MushroomCharacteristic)
+@receiver([post_save, post_delete], sender=Lookalike)
+@receiver([post_save, post_delete], sender=District)
+@receiver([post_save, post_delete], sender=PhotoVariant)
+@receiver(m2m_changed, sender=Mushroom.districts.through)
+def bump_catalog(sender, **kwargs):
+    """Новая версия каталога делает недействительными закэшированные результаты.
+
+    Версия увеличивается после фиксации транзакции: иначе параллельный
+    запрос мог бы прочитать новую версию со старыми данными и сохранить
+    их в кэше под новым ключом.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver([post_save, post_delete], sender=MushroomCharacteristic)
+def refresh_similarity(sender, instance, **kwargs):
+    """Похожие грибы пересчитываются после фиксации изменений характеристик"""
+    schedule_similarity_update([instance.mushroom_id])
+
+
+@receiver(pre_delete, sender=Mushroom)
+def refresh_similarity_neighbours(sender, instance, **kwargs):
+    """Грибы, у которых удаляемый гриб был в списке похожих, получат замену"""
+    neighbour_ids = list(
+        MushroomSimilarity.objects.filter(similar=instance).values_list('mushroom_id', flat=True)
+    )
+    if neighbour_ids:
+        schedule_similarity_update(neighbour_ids)
+
+
+@receiver(post_save, sender=Mushroom)
+def index_mushroom_text(sender, instance, **kwargs):
+    """Поисковый индекс FTS5 обновляется вместе с грибом"""
+    if is_available():
+        index_mushrooms([instance])
+
+
+@receiver(post_delete, sender=Mushroom)
+def remove_mushroom_text(sender, instance, **kwargs):
+    if is_available():
+        remove_mushroom(instance.id)
+
+
+@receiver(post_save, sender=Mushroom)
+def link_mushroom_districts(sender, instance, raw=False, **kwargs):
+    """Районы гриба обновляются по полю distribution"""
+    if not raw:
+        sync_districts(instance)
+
+
+@receiver(pre_save, sender=Mushroom)
+def remember_photo(sender, instance, raw=False, **kwargs):
+    """Запоминает прежнюю фотографию, чтобы после сохранения понять, сменилась ли она"""
+    if raw or instance.pk is None:
+        instance._previous_photo = None
+        return
+    instance._previous_photo = (
+        Mushroom.objects.filter(pk=instance.pk).values_list('photo', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Mushroom)
+def refresh_photo_variants(sender, instance, created, raw=False, **kwargs):
+    """Копии и перцептивные хеши фото пересчитываются после фиксации транзакции, если фото новое или заменено"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_photo', None)
+    if (instance.photo.name or None) != (previous or None):
+        mushroom_id = instance.id
+        transaction.on_commit(lambda: generate_variants_by_id(mushroom_id))
+        transaction.on_commit(lambda: update_photo_hashes_by_id(mushroom_id))
+
+
+@receiver(post_save, sender=Mushroom)
+def count_photo_references(sender, instance, created, raw=False, **kwargs):
+    """Новая фотография получает ссылку, заменённая её теряет"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_photo', None)
+    current = instance.photo.name or None
+    if current != (previous or None):
+        acquire([current])
+        release([previous])
+
+
+@receiver(post_delete, sender=Mushroom)
+def release_photo(sender, instance, **kwargs):
+    release([instance.photo.name])
+
+
+@receiver(post_delete, sender=PhotoVariant)
+def release_variant_file(sender, instance, **kwargs):
+    """Файл копии бывает общим у нескольких грибов, поэтому он только теряет ссылку"""
+    release([instance.file.name])
@@ -0,0 +1,160 @@
+"""Похожие грибы по характеристикам.
+
+Сходство двух грибов - взвешенный коэффициент Жаккара по матрице
+характеристик индекса определителя: сумма весов совпавших характеристик,
+делённая на сумму весов характеристик, известных хотя бы у одного из
+грибов. Важные характеристики весят больше (IDENTIFIER_WEIGHTS).
+
+Таблица MushroomSimilarity хранит для каждого гриба первые N соседей.
+Целиком она строится командой build_similarity, а после изменения
+характеристик гриба пересчитываются только затронутые строки.
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+
+from .cache import catalog_changed
+from .identifier import get_identifier_index, get_weights
+from .models import MushroomSimilarity
+
+# Ограничение на размер промежуточной матрицы оценок (строк × грибов)
+SCORES_BLOCK_SIZE = 4_000_000
+
+
+def get_similar_count():
+    """Сколько похожих грибов хранить для каждого гриба"""
+    return getattr(settings, 'SIMILAR_MUSHROOMS_COUNT', 4)
+
+
+def similarity_scores(index, positions):
+    """Матрица сходства грибов на позициях positions со всеми грибами индекса"""
+    weights = get_weights()
+    column_weights = np.where(index.important, weights['important'], weights['regular'])
+    rows = index.matrix[positions, :]
+    matched = np.zeros((len(positions), len(index.mushroom_ids)))
+    known = np.zeros_like(matched)
+    for col, weight in enumerate(column_weights):
+        own = rows[:, col][:, None]
+        other = index.matrix[:, col][None, :]
+        matched += weight * ((own == other) & (own != 0))
+        known += weight * ((own != 0) | (other != 0))
+    scores = np.divide(matched, known, out=np.zeros_like(matched), where=known > 0)
+    # Гриб не считается похожим сам на себя
+    scores[np.arange(len(positions)), positions] = 0.0
+    return scores
+
+
+def nearest(index, positions, top_n):
+    """Строки MushroomSimilarity для грибов на позициях positions"""
+    rows = []
+    block = max(1, SCORES_BLOCK_SIZE // max(len(index.mushroom_ids), 1))
+    for start in range(0, len(positions), block):
+        chunk = positions[start:start + block]
+        scores = similarity_scores(index, chunk)
+        for position, row in zip(chunk, scores):
+            k = min(top_n, len(row) - 1)
+            if k <= 0:
+                continue
+            candidates = np.argpartition(-row, k - 1)[:k]
+            # При равном сходстве выше тот, кто раньше в каталоге
+            candidates = candidates[np.lexsort((candidates, -row[candidates]))]
+            rank = 0
+            for candidate in candidates:
+                if row[candidate] <= 0:
+                    break
+                rank += 1
+                rows.append(MushroomSimilarity(
+                    mushroom_id=index.mushroom_ids[position],
+                    similar_id=index.mushroom_ids[candidate],
+                    score=round(float(row[candidate]), 4),
+                    rank=rank,
+                ))
+    return rows
+
+
+def _replace_rows(mushroom_ids, rows, batch_size=500):
+    mushroom_ids = list(mushroom_ids)
+    with transaction.atomic():
+        for start in range(0, len(mushroom_ids), batch_size):
+            MushroomSimilarity.objects.filter(mushroom_id__in=mushroom_ids[start:start + batch_size]).delete()
+        MushroomSimilarity.objects.bulk_create(rows, batch_size=batch_size)
+    catalog_changed()
+
+
+def build_similarity(top_n=None):
+    """Пересчитывает таблицу целиком, возвращает число строк"""
+    top_n = top_n or get_similar_count()
+    index = get_identifier_index()
+    rows = nearest(index, list(range(len(index.mushroom_ids))), top_n)
+    with transaction.atomic():
+        MushroomSimilarity.objects.all().delete()
+        MushroomSimilarity.objects.bulk_create(rows, batch_size=500)
+    catalog_changed()
+    return len(rows)
+
+
+def update_similarity(mushroom_ids, top_n=None):
+    """Пересчитывает соседей только там, где их могли изменить правки грибов.
+
+    Затронуты сами изменённые грибы, грибы, у которых они уже в списке
+    похожих, и грибы, для которых изменённый гриб теперь проходит в
+    первые N. Возвращает число пересчитанных грибов.
+    """
+    top_n = top_n or get_similar_count()
+    mushroom_ids = set(mushroom_ids)
+    index = get_identifier_index()
+    affected = set(mushroom_ids)
+    affected.update(
+        MushroomSimilarity.objects.filter(similar_id__in=mushroom_ids).values_list('mushroom_id', flat=True)
+    )
+
+    changed = [index.positions[mushroom_id] for mushroom_id in mushroom_ids if mushroom_id in index.positions]
+    if changed:
+        # Сходство симметрично: строка изменённого гриба - это его сходство с каждым из остальных
+        best = similarity_scores(index, changed).max(axis=0)
+        thresholds = {
+            row['mushroom_id']: (row['min_score'], row['count'])
+            for row in MushroomSimilarity.objects.values('mushroom_id').annotate(
+                min_score=Min('score'), count=Count('id')
+            )
+        }
+        for position in np.flatnonzero(best > 0):
+            min_score, count = thresholds.get(index.mushroom_ids[position], (0.0, 0))
+            if count < top_n or best[position] >= min_score:
+                affected.add(index.mushroom_ids[position])
+
+    # Удалённых грибов в индексе уже нет, их строки удалены каскадом
+    affected &= set(index.positions)
+    if not affected:
+        return 0
+    positions = sorted(index.positions[mushroom_id] for mushroom_id in affected)
+    _replace_rows(affected, nearest(index, positions, top_n))
+    return len(affected)
+
+
+_pending = threading.local()
+
+
+def schedule_similarity_update(mushroom_ids):
+    """Откладывает пересчёт до фиксации транзакции.
+
+    Правка гриба в админке сохраняет много характеристик в одной
+    транзакции; все они накапливаются и пересчитываются одним вызовом.
+    """
+    pending = getattr(_pending, 'ids', None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.update(mushroom_ids)
+    transaction.on_commit(flush_similarity_updates)
+
+
+def flush_similarity_updates():
+    """Пересчитывает накопленные грибы; повторные вызовы ничего не делают"""
+    pending = getattr(_pending, 'ids', None)
+    if not pending:
+        return
+    _pending.ids = set()
+    update_similarity(pending)
@@ -0,0 +1,282 @@
+"""Выгрузка атласа в статические HTML-страницы.
+
+Публичные страницы рендерятся тестовым клиентом Django в дерево
+<адрес>/index.html, ссылки между выгруженными страницами, статикой и
+медиафайлами переписываются на относительные. Рядом сохраняется
+манифест с отпечатком входных данных каждой страницы (ETag из
+conditional.py и хеш шаблонов): при повторной выгрузке страницы с
+прежним отпечатком не рендерятся заново.
+"""
+import hashlib
+import html
+import json
+import os
+import posixpath
+import re
+import shutil
+from pathlib import Path
+from urllib.parse import unquote, urljoin, urlsplit
+
+from django.conf import settings
+from django.urls import reverse
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_FORMAT = 2
+
+# Атрибуты со ссылками в отрендеренных страницах
+LINK_RE = re.compile(r'(?P<attr>\b(?:href|src))="(?P<url>[^"]*)"')
+# Наборы копий фотографий: «адрес ширина, адрес ширина»
+SRCSET_RE = re.compile(r'(?P<attr>\bsrcset)="(?P<value>[^"]*)"')
+# Формы и их адрес отправки
+FORM_RE = re.compile(r'<form\b(?P<attrs>[^>]*)>')
+ACTION_RE = re.compile(r'\baction="(?P<url>[^"]*)"')
+
+
+def page_file(url):
+    """Файл страницы в выгрузке: /mushroom/5/ -> mushroom/5/index.html"""
+    path = urlsplit(url).path.strip('/')
+    return f'{path}/index.html' if path else 'index.html'
+
+
+def collect_pages():
+    """Все публичные страницы: адрес -> (файл, вид отпечатка, id гриба)"""
+    from .catalog import get_catalog_snapshot
+    from .models import District
+    from .views import get_gallery_page
+
+    pages = {}
+    names = ('home', 'kingdom_info', 'edible_mushrooms', 'poisonous_mushrooms', 'fruiting_now', 'district_list')
+    for name in names:
+        url = reverse(name)
+        pages[url] = (page_file(url), 'catalog', None)
+
+    for district in District.objects.only('id'):
+        url = reverse('district_detail', args=[district.id])
+        pages[url] = (page_file(url), 'catalog', None)
+
+    for month in range(1, 13):
+        url = reverse('fruiting_month', args=[month])
+        pages[url] = (page_file(url), 'catalog', None)
+
+    # Страницы галереи по курсорам: /gallery/, /gallery/2/, ...
+    gallery_url = reverse('gallery')
+    pages[gallery_url] = (page_file(gallery_url), 'catalog', None)
+    _, cursor = get_gallery_page()
+    number = 2
+    while cursor:
+        pages[f'{gallery_url}?cursor={cursor}'] = (page_file(f'{gallery_url}{number}/'), 'catalog', None)
+        _, cursor = get_gallery_page(cursor)
+        number += 1
+
+    for mushroom in get_catalog_snapshot().mushrooms:
+        url = reverse('mushroom_detail', args=[mushroom.id])
+        pages[url] = (page_file(url), 'mushroom', mushroom.id)
+    return pages
+
+
+def templates_hash():
+    """Хеш всех шаблонов проекта и приложения"""
+    digest = hashlib.sha256()
+    directories = [Path(directory) for template in settings.TEMPLATES for directory in template.get('DIRS', [])]
+    directories.append(Path(__file__).resolve().parent / 'templates')
+    for directory in directories:
+        if not directory.is_dir():
+            continue
+        for path in sorted(directory.rglob('*.html')):
+            digest.update(str(path.relative_to(directory)).encode('utf-8'))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def read_manifest(output_dir):
+    try:
+        manifest = json.loads((Path(output_dir) / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('format') != MANIFEST_FORMAT:
+        return {}
+    return manifest.get('pages', {})
+
+
+def write_manifest(output_dir, pages):
+    manifest = {'format': MANIFEST_FORMAT, 'pages': pages}
+    (Path(output_dir) / MANIFEST_NAME).write_text(
+        json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True), encoding='utf-8'
+    )
+
+
+def rewrite_links(content, page_url, page_path, links, dynamic_url=''):
+    """Переписывает ссылки страницы на относительные пути внутри выгрузки.
+
+    links - адрес выгруженной страницы -> её файл. Ссылки на статику и
+    медиа, в том числе в srcset, ведут в каталоги static/ и media/
+    выгрузки. Остальные адреса сайта (определитель, квизы), адреса с
+    параметрами, которых нет среди выгруженных страниц (фильтры по
+    съедобности и районам), и отправка форм остаются обращениями к
+    Django, при необходимости с префиксом dynamic_url: статический
+    сервер отбросил бы параметры и показал страницу без фильтра.
+    """
+    base = posixpath.dirname(page_path) or '.'
+
+    def relative(target):
+        return posixpath.relpath(target, base)
+
+    def rewrite(value, dynamic=False):
+        if value.startswith(('#', 'javascript:', 'mailto:', 'data:')) or (not value and not dynamic):
+            return value
+        absolute = urljoin(page_url, value)
+        parts = urlsplit(absolute)
+        if parts.scheme or parts.netloc:
+            return value
+
+        fragment = f'#{parts.fragment}' if parts.fragment else ''
+        if not dynamic:
+            # Курсоры галереи в ссылках закодированы, в адресах выгрузки - нет
+            location = parts.path + (f'?{unquote(parts.query)}' if parts.query else '')
+            if location in links:
+                return relative(links[location]) + fragment
+            if parts.path.startswith((settings.STATIC_URL, settings.MEDIA_URL)):
+                return relative(parts.path.lstrip('/'))
+        location = parts.path + (f'?{parts.query}' if parts.query else '')
+        return dynamic_url.rstrip('/') + location + fragment
+
+    def replace(match):
+        value = html.unescape(match.group('url'))
+        return f'{match.group("attr")}="{html.escape(rewrite(value))}"'
+
+    def replace_srcset(match):
+        candidates = []
+        for candidate in html.unescape(match.group('value')).split(','):
+            url, _, descriptor = candidate.strip().partition(' ')
+            candidates.append(f'{rewrite(url)} {descriptor}'.strip())
+        return f'{match.group("attr")}="{html.escape(", ".join(candidates))}"'
+
+    def replace_form(match):
+        attrs = match.group('attrs')
+        action = ACTION_RE.search(attrs)
+        # Форма без action отправляется на адрес самой страницы
+        value = rewrite(html.unescape(action.group('url')) if action else page_url, dynamic=True)
+        attribute = f'action="{html.escape(value)}"'
+        if action:
+            attrs = attrs[:action.start()] + attribute + attrs[action.end():]
+        else:
+            attrs = f' {attribute}{attrs}'
+        return f'<form{attrs}>'
+
+    content = LINK_RE.sub(replace, content)
+    content = FORM_RE.sub(replace_form, content)
+    return SRCSET_RE.sub(replace_srcset, content)
+
+
+_worker = {}
+
+
+def init_worker(settings_module, output_dir, links, dynamic_url):
+    """Подготовка процесса выгрузки: свой Django и свои соединения с БД"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    from django.db import connections
+    from django.test import Client
+
+    # Соединения, унаследованные от родительского процесса, не используются
+    connections.close_all()
+    _worker.update(
+        client=Client(),
+        output_dir=Path(output_dir),
+        links=links,
+        dynamic_url=dynamic_url,
+    )
+
+
+def page_fingerprint(kind, mushroom_id, url, extra):
+    """Отпечаток входных данных страницы"""
+    from .conditional import catalog_stamp, mushroom_stamp
+    from .seasons import current_month
+
+    stamp = catalog_stamp() if kind == 'catalog' else mushroom_stamp(mushroom_id)
+    etag = stamp[1] if stamp else None
+    if kind == 'catalog':
+        # Главная и страница сезона показывают грибы текущего месяца
+        etag = f'{etag}:{current_month()}'
+    return hashlib.sha256(f'{url}|{etag}|{extra}'.encode('utf-8')).hexdigest()
+
+
+def render_page(task):
+    """Рендерит одну страницу, если её входные данные изменились.
+
+    Возвращает (адрес, файл, отпечаток, статус): статус 'rendered',
+    'skipped' или текст ошибки.
+    """
+    url, path, kind, mushroom_id, previous, extra = task
+    fingerprint = page_fingerprint(kind, mushroom_id, url, extra)
+    target = _worker['output_dir'] / path
+    if fingerprint == previous and target.exists():
+        return url, path, fingerprint, 'skipped'
+
+    response = _worker['client'].get(url)
+    if response.status_code != 200:
+        return url, path, None, f'HTTP {response.status_code}'
+
+    content = rewrite_links(
+        response.content.decode(response.charset or 'utf-8'), url, path,
+        _worker['links'], _worker['dynamic_url'],
+    )
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(content, encoding='utf-8')
+    return url, path, fingerprint, 'rendered'
+
+
+def copy_tree(source, destination):
+    """Копирует новые и изменённые файлы, возвращает их число"""
+    copied = 0
+    source = Path(source)
+    if not source.is_dir():
+        return 0
+    for path in source.rglob('*'):
+        if not path.is_file():
+            continue
+        target = Path(destination) / path.relative_to(source)
+        stat = path.stat()
+        if target.exists() and target.stat().st_size == stat.st_size and target.stat().st_mtime >= stat.st_mtime:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, target)
+        copied += 1
+    return copied
+
+
+def copy_static(output_dir):
+    """Копирует статику приложений (кроме админки) в static/ выгрузки"""
+    from django.contrib.staticfiles import finders
+
+    copied = 0
+    destination = Path(output_dir) / settings.STATIC_URL.strip('/')
+    for finder in finders.get_finders():
+        for relative_path, storage in finder.list(['admin']):
+            source = Path(storage.path(relative_path))
+            target = destination / relative_path
+            if target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target)
+            copied += 1
+    return copied
+
+
+def copy_media(output_dir):
+    """Копирует медиафайлы в media/ выгрузки"""
+    return copy_tree(settings.MEDIA_ROOT, Path(output_dir) / unquote(settings.MEDIA_URL.strip('/')))
+
+
+def remove_stale(output_dir, stale_paths):
+    """Удаляет страницы, которых больше нет на сайте (например, удалённых грибов)"""
+    output_dir = Path(output_dir)
+    for path in stale_paths:
+        target = output_dir / path
+        if target.exists():
+            target.unlink()
+        parent = target.parent
+        while parent != output_dir and parent.is_dir() and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
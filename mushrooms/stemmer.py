@@ -0,0 +1,147 @@
+"""Стеммер русского языка для поиска.
+
+Реализация алгоритма Snowball (Porter) для русского языка: у слова
+отбрасываются окончания причастий, прилагательных, глаголов и
+существительных, так что «подберёзовики», «подберезовика» и
+«подберезовик» дают одну основу. Перед стеммингом «ё» заменяется на
+«е». Для слов с беглыми гласными и супплетивными формами, которые
+алгоритм не сводит к одной основе («опята» и «опёнок»), есть словарь
+исключений.
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND_1 = ('в', 'вши', 'вшись')
+PERFECTIVE_GERUND_2 = ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+REFLEXIVE = ('ся', 'сь')
+VERB_1 = (
+    'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть',
+    'ешь', 'нно',
+)
+VERB_2 = (
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им',
+    'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть',
+    'ишь', 'ую', 'ю',
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой',
+    'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь',
+    'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейш', 'ейше')
+DERIVATIONAL = ('ост', 'ость')
+
+# Основы, которые алгоритм не сводит к общей: беглые гласные и особые формы множественного числа
+IRREGULAR_STEMS = {
+    'опят': 'опенк',
+    'опенок': 'опенк',
+    'опенек': 'опенк',
+}
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'[а-я]')
+
+
+def _regions(word):
+    """Начала областей RV и R2 по правилам Snowball"""
+    rv = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+
+    def after_consonant_after_vowel(start):
+        for i in range(start + 1, len(word)):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = after_consonant_after_vowel(0)
+    r2 = after_consonant_after_vowel(r1)
+    return rv, r2
+
+
+def _strip(rv, endings, after_a=()):
+    """Отбрасывает самое длинное окончание; окончания after_a - только после «а» или «я»"""
+    longest = None
+    for ending in endings + after_a:
+        if rv.endswith(ending) and (longest is None or len(ending) > len(longest)):
+            longest = ending
+    if longest is None:
+        return None
+    stem = rv[:-len(longest)]
+    if longest in endings or stem.endswith(('а', 'я')):
+        return stem
+    return None
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа одного слова в нижнем регистре"""
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.search(word):
+        return word
+    if word in IRREGULAR_STEMS:
+        return IRREGULAR_STEMS[word]
+
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1: деепричастие или (возвратная частица +) прилагательное / глагол / существительное
+    result = _strip(rv, PERFECTIVE_GERUND_2, PERFECTIVE_GERUND_1)
+    if result is None:
+        reflexive = _strip(rv, REFLEXIVE)
+        if reflexive is not None:
+            rv = reflexive
+        result = _strip(rv, ADJECTIVE)
+        if result is not None:
+            participle = _strip(result, PARTICIPLE_2, PARTICIPLE_1)
+            if participle is not None:
+                result = participle
+        else:
+            result = _strip(rv, VERB_2, VERB_1)
+            if result is None:
+                result = _strip(rv, NOUN)
+    if result is not None:
+        rv = result
+
+    # Шаг 2: конечное «и»
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательный суффикс в R2
+    for ending in DERIVATIONAL[::-1]:
+        if rv.endswith(ending) and rv_start + len(rv) - len(ending) >= r2_start:
+            rv = rv[:-len(ending)]
+            break
+
+    # Шаг 4: «нн», превосходная степень, мягкий знак
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        superlative = _strip(rv, SUPERLATIVE)
+        if superlative is not None:
+            rv = superlative[:-1] if superlative.endswith('нн') else superlative
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+
+    result = prefix + rv
+    return IRREGULAR_STEMS.get(result, result)
+
+
+def stem_words(text):
+    """Основы всех слов текста по порядку"""
+    return [stem(word) for word in WORD_RE.findall(text or '')]
+
+
+def stem_text(text):
+    """Основы слов текста через пробел - содержимое столбцов основ в индексе"""
+    return ' '.join(stem_words(text))
@@ -0,0 +1,132 @@
+"""Хранилище фотографий с адресацией по содержимому.
+
+Файл сохраняется под именем <каталог>/<первые 2 символа>/<SHA-256>.<расширение>,
+поэтому повторная загрузка той же фотографии не создаёт копию, а имя
+файла никогда не указывает на другое содержимое - такие адреса можно
+кэшировать в браузере навсегда (см. views.media_file). Число ссылок на
+каждый файл из Mushroom.photo и PhotoVariant.file хранится в StoredFile;
+файлы без ссылок удаляет команда cleanup_photos.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import unicodedata
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.db.models import F
+from django.utils import timezone
+
+HASH_CHUNK_SIZE = 1024 * 1024
+HASHED_NAME_RE = re.compile(r'(?:^|/)(?P<prefix>[0-9a-f]{2})/(?P<digest>[0-9a-f]{64})\.[a-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Пары кодировок, в которых имена старых загрузок попали на диск искажёнными:
+# имя на диске = правильное имя.encode(первая).decode(вторая)
+MOJIBAKE_CODECS = [
+    ('cp866', 'mac_cyrillic'),
+    ('utf-8', 'cp866'),
+    ('utf-8', 'mac_cyrillic'),
+    ('utf-8', 'cp1251'),
+    ('utf-8', 'latin-1'),
+]
+
+
+def content_hash(content):
+    """SHA-256 загружаемого файла; позиция чтения возвращается в начало"""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    """Имя файла выдано ContentAddressedStorage"""
+    match = HASHED_NAME_RE.search(name or '')
+    return bool(match) and match.group('digest').startswith(match.group('prefix'))
+
+
+def repaired_names(name):
+    """Варианты правильного имени для искажённого имени файла на диске"""
+    directory, filename = posixpath.split(name)
+    found = {unicodedata.normalize('NFC', filename)}
+    for encoding, wrong_encoding in MOJIBAKE_CODECS:
+        try:
+            found.add(unicodedata.normalize('NFC', filename.encode(wrong_encoding).decode(encoding)))
+        except UnicodeError:
+            continue
+    return {posixpath.join(directory, candidate) for candidate in found}
+
+
+def legacy_index(names):
+    """Правильное имя -> имя файла на диске для файлов с искажёнными именами"""
+    index = {}
+    for name in names:
+        for candidate in repaired_names(name):
+            index.setdefault(candidate, name)
+    return index
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла - хеш его содержимого"""
+
+    def hashed_name(self, name, content):
+        directory, filename = posixpath.split(str(name).replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.jpeg':
+            extension = '.jpg'
+        digest = content_hash(content)
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        validate_file_name(name, allow_relative_path=True)
+        if self.exists(name):
+            # Такой файл уже есть: одинаковые загрузки хранятся один раз. Время изменения
+            # обновляется, чтобы cleanup_photos не удалил файл, на который вот-вот появится ссылка
+            os.utime(self.path(name))
+            return name
+        return self._save(name, content)
+
+
+_photo_storage = ContentAddressedStorage()
+
+
+def get_photo_storage():
+    """Хранилище для полей фотографий (вызываемый объект, чтобы не попасть в миграции)"""
+    return _photo_storage
+
+
+def acquire(names):
+    """Увеличивает число ссылок на файлы"""
+    from .models import StoredFile
+
+    storage = get_photo_storage()
+    for name in filter(None, names):
+        stored, created = StoredFile.objects.get_or_create(
+            name=name, defaults={'size': storage.size(name) if storage.exists(name) else 0}
+        )
+        StoredFile.objects.filter(id=stored.id).update(ref_count=F('ref_count') + 1, released_at=None)
+
+
+def release(names):
+    """Уменьшает число ссылок; файл без ссылок ждёт cleanup_photos"""
+    from .models import StoredFile
+
+    names = [name for name in names if name]
+    if not names:
+        return
+    StoredFile.objects.filter(name__in=names, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    StoredFile.objects.filter(name__in=names, ref_count=0, released_at__isnull=True).update(
+        released_at=timezone.now()
+    )
@@ -0,0 +1,65 @@
+"""Вывод фотографии гриба через <picture> с уменьшенными копиями (см. images.py)"""
+from django import template
+
+register = template.Library()
+
+# Место на странице -> (копия для src, атрибут sizes с шириной картинки на экране)
+LAYOUTS = {
+    'card': ('card', '(min-width: 1200px) 356px, (min-width: 768px) 33vw, 100vw'),
+    'thumb': ('card', '(min-width: 1200px) 170px, (min-width: 768px) 33vw, 100vw'),
+    'detail': ('detail', '(min-width: 992px) 540px, 100vw'),
+}
+
+
+def _srcset(variants):
+    return ', '.join(f'{variant.file.url} {variant.width}w' for variant in variants)
+
+
+def _placeholder_style(mushroom):
+    """Фон картинки до загрузки: основной цвет и размытое превью из полей гриба"""
+    if not mushroom.photo_color:
+        return ''
+    if not mushroom.photo_placeholder:
+        return f'background-color: {mushroom.photo_color};'
+    return (
+        f"background: {mushroom.photo_color} url('{mushroom.photo_placeholder}') center / cover no-repeat;"
+    )
+
+
+@register.inclusion_tag('mushroom_picture.html')
+def mushroom_picture(mushroom, layout='card', css_class='', style='', lazy=True):
+    """<picture> с WebP и JPEG копиями; без копий выводится оригинал.
+
+    Пока фото загружается, на его месте видна заглушка: размеры в width и
+    height и фон из сохранённых основного цвета и превью.
+    """
+    preset, sizes = LAYOUTS[layout]
+    context = {
+        'alt': mushroom.russian_name,
+        'css_class': css_class,
+        'style': ' '.join(filter(None, [style, _placeholder_style(mushroom)])),
+        'lazy': lazy,
+        'sizes': sizes,
+        'src': None,
+    }
+    if not mushroom.photo:
+        return context
+
+    # Копии обычно уже загружены через prefetch_related('photo_variants')
+    by_format = {}
+    for variant in sorted(mushroom.photo_variants.all(), key=lambda variant: variant.width):
+        by_format.setdefault(variant.format, []).append(variant)
+    fallback = by_format.get('jpeg', [])
+    if not fallback:
+        context.update(src=mushroom.photo.url, width=mushroom.photo_width, height=mushroom.photo_height)
+        return context
+
+    main = next((variant for variant in fallback if variant.preset == preset), fallback[-1])
+    context.update(
+        src=main.file.url,
+        width=main.width,
+        height=main.height,
+        jpeg_srcset=_srcset(fallback),
+        webp_srcset=_srcset(by_format.get('webp', [])),
+    )
+    return context
@@ -0,0 +1,134 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .identifier import get_identifier_index
+from .models import Characteristic, CharacteristicOption, District, Lookalike, Mushroom, MushroomCharacteristic
+from .static_export import rewrite_links
+
+
+class IdentifierQueryCountTests(TestCase):
+    """Результаты определителя загружаются постоянным числом запросов"""
+
+    # Грибы с прогретым индексом, копии их фото, двойники всех грибов сразу
+    EXPECTED_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.characteristic = Characteristic.objects.create(name='Шляпка', question='Какая шляпка?')
+        cls.option = CharacteristicOption.objects.create(
+            characteristic=cls.characteristic, value='red', description='Красная'
+        )
+
+    def create_mushrooms(self, count):
+        """Грибы с выбранным вариантом характеристики и двойником у каждого"""
+        created = Mushroom.objects.count()
+        for number in range(created, created + count):
+            mushroom = Mushroom.objects.create(
+                russian_name=f'Гриб {number}',
+                latin_name=f'Fungus {number}',
+                mushroom_type='lamellar',
+                edibility='edible',
+                description='Описание',
+                habitat='Лес',
+                season='август',
+            )
+            lookalike = Mushroom.objects.create(
+                russian_name=f'Двойник {number}',
+                latin_name=f'Fungus falsus {number}',
+                mushroom_type='lamellar',
+                edibility='poisonous',
+                description='Описание',
+                habitat='Лес',
+                season='август',
+            )
+            MushroomCharacteristic.objects.create(
+                mushroom=mushroom, characteristic=self.characteristic, option=self.option
+            )
+            Lookalike.objects.create(
+                mushroom=mushroom,
+                lookalike=lookalike,
+                danger_level='high',
+                differences='Цвет',
+                visual_differences='Кольцо',
+            )
+
+    def post_identifier(self):
+        # Без кэша результатов; индекс определителя уже в памяти процесса
+        cache.clear()
+        get_identifier_index()
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.post(
+                reverse('interactive_identifier'), {f'char_{self.characteristic.id}': self.option.value}
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.context['results']
+
+    def test_query_count_does_not_depend_on_results(self):
+        self.create_mushrooms(3)
+        results = self.post_identifier()
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result['lookalikes'] for result in results))
+
+        self.create_mushrooms(12)
+        results = self.post_identifier()
+        self.assertEqual(len(results), 15)
+        self.assertTrue(all(result['lookalikes'] for result in results))
+
+
+class ConditionalGetTests(TestCase):
+    """ETag страниц меняется вместе с данными, которые на них выводятся"""
+
+    def setUp(self):
+        cache.clear()
+        self.district = District.objects.create(name='Каслинский район', kind='district', key='каслинский')
+        self.mushroom = Mushroom.objects.create(
+            russian_name='Белый гриб',
+            latin_name='Boletus edulis',
+            mushroom_type='tubular',
+            edibility='edible',
+            description='Описание',
+            habitat='Лес',
+            season='август',
+        )
+        self.mushroom.districts.add(self.district)
+
+    def test_district_rename_changes_etag(self):
+        urls = [
+            reverse('district_detail', args=[self.district.id]),
+            reverse('mushroom_detail', args=[self.mushroom.id]),
+            reverse('edible_mushrooms'),
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        self.district.name = 'Кусинский район'
+        # Версия каталога увеличивается после фиксации транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            self.district.save()
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+            self.assertContains(response, 'Кусинский район')
+
+
+class RewriteLinksTests(SimpleTestCase):
+    """Фильтры с параметрами и формы статической выгрузки ведут в Django"""
+
+    links = {'/edible/': 'edible/index.html', '/fruiting/8/': 'fruiting/8/index.html'}
+
+    def rewrite(self, content):
+        return rewrite_links(content, '/fruiting/8/', 'fruiting/8/index.html', self.links, 'https://dyn.example')
+
+    def test_exported_page_link_is_relative(self):
+        self.assertEqual(self.rewrite('<a href="/edible/">'), '<a href="../../edible/index.html">')
+
+    def test_filtered_link_is_dynamic(self):
+        self.assertEqual(
+            self.rewrite('<a href="?edibility=edible&amp;district=3">'),
+            '<a href="https://dyn.example/fruiting/8/?edibility=edible&amp;district=3">',
+        )
+
+    def test_form_without_action_is_dynamic(self):
+        self.assertEqual(
+            self.rewrite('<form method="get">'),
+            '<form action="https://dyn.example/fruiting/8/" method="get">',
+        )
@@ -6,8 +6,19 @@ urlpatterns = [
     path('edible/', views.edible_mushrooms, name='edible_mushrooms'),
     path('poisonous/', views.poisonous_mushrooms, name='poisonous_mushrooms'),
     path('gallery/', views.gallery, name='gallery'),
+    path('gallery/page/', views.gallery_page, name='gallery_page'),
+    path('fruiting/', views.fruiting_now, name='fruiting_now'),
+    path('fruiting/<int:month>/', views.fruiting_month, name='fruiting_month'),
+    path('districts/', views.district_list, name='district_list'),
+    path('district/<int:district_id>/', views.district_detail, name='district_detail'),
     path('identifier/', views.interactive_identifier, name='interactive_identifier'),
+    path('identifier/step/', views.identifier_step, name='identifier_step'),
+    path('identifier/next-question/', views.identifier_next_question, name='identifier_next_question'),
+    path('identifier/option-counts/', views.identifier_option_counts, name='identifier_option_counts'),
+    path('identifier/cache-stats/', views.identifier_cache_stats_view, name='identifier_cache_stats'),
     path('mushroom/<int:mushroom_id>/', views.mushroom_detail, name='mushroom_detail'),
+    path('search/', views.search_mushrooms, name='search_mushrooms'),
+    path('search/autocomplete/', views.autocomplete_mushrooms, name='autocomplete_mushrooms'),
     path('quiz/', views.quiz_home, name='quiz_home'),
     path('quiz/<int:quiz_id>/start/', views.quiz_start, name='quiz_start'),
     path('quiz/question/', views.quiz_question, name='quiz_question'),
@@ -1,85 +1,216 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q
+from django.views.static import serve
+from django.conf import settings
+import base64
+import json
 import random
 import openpyxl
 from django.http import HttpResponse
+from django.template.loader import render_to_string
 from django.utils import timezone
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from .models import (
-    Mushroom, Quiz, QuizQuestion, QuizAnswer, QuizResult,
+    District, Mushroom, Quiz, QuizQuestion, QuizAnswer, QuizResult,
     Characteristic, CharacteristicOption, MushroomCharacteristic, Lookalike, UserAnswer
 )
+from .autocomplete import DEFAULT_LIMIT, autocomplete
+from .cache import catalog_page_cache, get_identifier_results, identifier_cache_stats, set_identifier_results
+from .catalog import EDIBLE, POISONOUS, fruiting_in_month, get_catalog_snapshot
+from .conditional import catalog_condition, mushroom_condition
+from .districts import district_counts
+from .identifier import (
+    get_identifier_index, live_option_counts, match_percentage, next_question, rank_mushrooms
+)
+from . import search
+from .seasons import MONTH_NAMES, MONTH_NAMES_PREPOSITIONAL, current_month
+from .similarity import get_similar_count
+from .storage import IMMUTABLE_CACHE_CONTROL, is_content_addressed
+
+# Количество карточек галереи в одном ответе
+GALLERY_PAGE_SIZE = 24
+# Количество грибов сезона на главной
+HOME_SEASON_COUNT = 6
+# Фильтры страницы сезона: параметр edibility -> значения съедобности
+FRUITING_FILTERS = {
+    'edible': EDIBLE,
+    'poisonous': POISONOUS,
+}
 
+@catalog_condition
+@catalog_page_cache
 def home(request):
     """Главная страница"""
-    return render(request, 'home.html')
+    month = current_month()
+    season_mushrooms = fruiting_in_month(month, EDIBLE)
+    return render(request, 'home.html', {
+        'season_mushrooms': season_mushrooms[:HOME_SEASON_COUNT],
+        'season_count': season_mushrooms.count(),
+        'month': month,
+        'month_in': MONTH_NAMES_PREPOSITIONAL[month - 1],
+    })
+
+def get_district_filter(request):
+    """Район из параметра district или None"""
+    value = request.GET.get('district', '')
+    if not value.isdigit():
+        return None
+    return next((district for district in district_counts() if district.id == int(value)), None)
 
+def get_filtered_snapshot(district):
+    """Снимок каталога, при фильтре - только грибы района"""
+    snapshot = get_catalog_snapshot()
+    return snapshot.for_district(district.id) if district else snapshot
+
+@catalog_condition
+@catalog_page_cache
 def edible_mushrooms(request):
     """Съедобные грибы"""
-    mushrooms = Mushroom.objects.filter(
-        edibility__in=['edible', 'conditionally_edible']
-    )
-    
-    tubular = mushrooms.filter(mushroom_type='tubular')
-    lamellar = mushrooms.filter(mushroom_type='lamellar')
-    other = mushrooms.filter(mushroom_type='other')
+    district = get_district_filter(request)
+    # Все группы берутся из одного снимка каталога вместо трёх запросов
+    groups = get_filtered_snapshot(district).by_type(EDIBLE)
     
     return render(request, 'edible_mushrooms.html', {
-        'tubular_mushrooms': tubular,
-        'lamellar_mushrooms': lamellar,
-        'other_mushrooms': other,
+        'tubular_mushrooms': groups['tubular'],
+        'lamellar_mushrooms': groups['lamellar'],
+        'other_mushrooms': groups['other'],
+        'district': district,
+        'districts': district_counts(),
     })
 
+@catalog_condition
+@catalog_page_cache
 def poisonous_mushrooms(request):
     """Ядовитые грибы"""
-    mushrooms = Mushroom.objects.filter(
-        edibility__in=['poisonous', 'deadly']
-    )
+    district = get_district_filter(request)
+    mushrooms = get_filtered_snapshot(district).select(POISONOUS)
     return render(request, 'poisonous_mushrooms.html', {
-        'mushrooms': mushrooms
+        'mushrooms': mushrooms,
+        'district': district,
+        'districts': district_counts(),
     })
 
+@catalog_condition
+@catalog_page_cache
 def gallery(request):
-    """Галерея всех грибов"""
-    mushrooms = Mushroom.objects.all()
+    """Галерея всех грибов (первая страница, остальные подгружаются при прокрутке)"""
+    district = get_district_filter(request)
+    mushrooms, next_cursor = get_gallery_page(request.GET.get('cursor'), district=district)
     return render(request, 'gallery.html', {
-        'mushrooms': mushrooms
+        'mushrooms': mushrooms,
+        'next_cursor': next_cursor,
+        'district': district,
+        'districts': district_counts(),
+    })
+
+@catalog_condition
+@catalog_page_cache
+def gallery_page(request):
+    """Следующая страница карточек галереи (AJAX)"""
+    district = get_district_filter(request)
+    mushrooms, next_cursor = get_gallery_page(request.GET.get('cursor'), district=district)
+    return JsonResponse({
+        'html': render_to_string('gallery_cards.html', {'mushrooms': mushrooms}, request=request),
+        'next_cursor': next_cursor,
+    })
+
+@catalog_condition
+@catalog_page_cache
+def fruiting_now(request):
+    """Грибы, плодоносящие в текущем месяце"""
+    return render_fruiting(request, current_month())
+
+@catalog_condition
+@catalog_page_cache
+def fruiting_month(request, month):
+    """Грибы, плодоносящие в выбранном месяце"""
+    if not 1 <= month <= 12:
+        raise Http404("Нет такого месяца")
+    return render_fruiting(request, month)
+
+def render_fruiting(request, month):
+    """Страница сезона с фильтрами по съедобности (?edibility=edible|poisonous) и району"""
+    edibility = request.GET.get('edibility')
+    if edibility not in FRUITING_FILTERS:
+        edibility = None
+    district = get_district_filter(request)
+    mushrooms = fruiting_in_month(month, FRUITING_FILTERS.get(edibility), district.id if district else None)
+    return render(request, 'fruiting.html', {
+        'district': district,
+        'districts': district_counts(),
+        'mushrooms': mushrooms,
+        'month': month,
+        'month_in': MONTH_NAMES_PREPOSITIONAL[month - 1],
+        'months': list(enumerate(MONTH_NAMES, start=1)),
+        'current_month': current_month(),
+        'edibility': edibility,
+    })
+
+@catalog_condition
+@catalog_page_cache
+def district_list(request):
+    """Районы области с числом грибов"""
+    return render(request, 'district_list.html', {
+        'districts': district_counts(),
     })
 
+@catalog_condition
+@catalog_page_cache
+def district_detail(request, district_id):
+    """Грибы района"""
+    district = get_object_or_404(District, id=district_id)
+    # Выборка по индексу связующей таблицы (district_id)
+    mushrooms = district.mushrooms.prefetch_related('photo_variants').order_by('russian_name', 'id')
+    return render(request, 'district_detail.html', {
+        'district': district,
+        'mushrooms': mushrooms,
+        'edible_count': sum(mushroom.edibility in EDIBLE for mushroom in mushrooms),
+        'poisonous_count': sum(mushroom.edibility in POISONOUS for mushroom in mushrooms),
+    })
+
+def encode_gallery_cursor(mushroom):
+    """Курсор галереи: позиция последней показанной карточки (название, id)"""
+    raw = json.dumps([mushroom.russian_name, mushroom.id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_gallery_cursor(cursor):
+    """Разбирает курсор галереи; некорректный курсор означает начало списка"""
+    try:
+        russian_name, mushroom_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(russian_name), int(mushroom_id)
+    except (ValueError, TypeError, UnicodeError):
+        return None
+
+def get_gallery_page(cursor=None, page_size=GALLERY_PAGE_SIZE, district=None):
+    """Страница галереи по ключу (название, id) из снимка каталога"""
+    position = decode_gallery_cursor(cursor) if cursor else None
+    page, has_more = get_filtered_snapshot(district).page_after(position, page_size)
+    next_cursor = encode_gallery_cursor(page[-1]) if has_more else None
+    return page, next_cursor
+
 def interactive_identifier(request):
     """Интерактивный определитель грибов"""
     characteristics = Characteristic.objects.prefetch_related('characteristicoption_set').all()
     
     if request.method == 'POST':
-        selected_options = {}
-        for key, value in request.POST.items():
-            if key.startswith('char_') and value:  # Только если значение не пустое
-                char_id = key.replace('char_', '')
-                selected_options[char_id] = value
+        selected_options = get_selected_options(request.POST)
         
-        # Всегда находим грибы, даже если не выбрано ни одной характеристики
-        matching_mushrooms = find_matching_mushrooms(selected_options)
+        # Частичный режим показывает грибы, совпавшие хотя бы по одному ответу
+        partial = request.POST.get('match_mode') == 'partial'
         
-        results = []
-        for mushroom in matching_mushrooms:
-            lookalikes = Lookalike.objects.filter(mushroom=mushroom).select_related('lookalike')
-            match_percentage = calculate_match_percentage(mushroom, selected_options)
-            
-            results.append({
-                'mushroom': mushroom,
-                'lookalikes': lookalikes,
-                'match_percentage': match_percentage
-            })
-        
-        # Сортируем по проценту совпадения
-        results.sort(key=lambda x: x['match_percentage'], reverse=True)
+        # Повторные запросы с тем же набором ответов берутся из кэша целиком
+        results = get_identifier_results(selected_options, partial)
+        if results is None:
+            results = build_identifier_results(selected_options, partial)
+            set_identifier_results(selected_options, partial, results)
         
         context = {
             'results': results,
             'selected_options': selected_options,
-            'answered_questions': len(selected_options)
+            'answered_questions': len(selected_options),
+            'partial': partial,
         }
         return render(request, 'identifier_results.html', context)
     
@@ -88,51 +219,101 @@ def interactive_identifier(request):
     }
     return render(request, 'identifier_questions.html', context)
 
+def get_selected_options(params):
+    """Собирает ответы вида char_<id>=значение из параметров запроса"""
+    selected_options = {}
+    for key, value in params.items():
+        if key.startswith('char_') and value:  # Только если значение не пустое
+            char_id = key.replace('char_', '')
+            selected_options[char_id] = value
+    return selected_options
+
+def identifier_step(request):
+    """Пошаговый определитель: вопросы подбираются по ходу ответов"""
+    return render(request, 'identifier_step.html')
+
+def identifier_next_question(request):
+    """Следующий вопрос пошагового определителя (AJAX)"""
+    selected_options = get_selected_options(request.GET)
+    skipped = request.GET.getlist('skip')
+    return JsonResponse(next_question(selected_options, skipped))
+
+def build_identifier_results(selected_options, partial=False):
+    """Подбирает, ранжирует грибы и прикладывает к ним двойников"""
+    min_matches = min(1, len(selected_options)) if partial else None
+    
+    # Совпадения считаются сразу для всех грибов одним проходом по индексу
+    ranking = rank_mushrooms(selected_options, min_matches=min_matches)
+    mushroom_ids = [entry['mushroom_id'] for entry in ranking]
+    mushrooms = {
+        mushroom.id: mushroom
+        for mushroom in Mushroom.objects.filter(id__in=mushroom_ids).prefetch_related('photo_variants')
+    }
+    
+    # Двойники всех найденных грибов загружаются одним запросом
+    lookalikes_map = get_lookalikes_map(mushroom_ids)
+    
+    results = []
+    for entry in ranking:
+        mushroom = mushrooms.get(entry['mushroom_id'])
+        if mushroom is None:
+            continue
+        
+        results.append({
+            'mushroom': mushroom,
+            'lookalikes': lookalikes_map.get(mushroom.id, []),
+            'match_percentage': entry['match_percentage'],
+            'match_count': entry['match_count'],
+            'score': entry['score'],
+        })
+    return results
+
+@staff_member_required
+def identifier_cache_stats_view(request):
+    """Статистика кэша результатов определителя"""
+    return JsonResponse(identifier_cache_stats())
+
+def get_lookalikes_map(mushroom_ids):
+    """Двойники для набора грибов: {id гриба: [двойники]} за один запрос"""
+    lookalikes_map = {}
+    lookalikes = Lookalike.objects.filter(
+        mushroom_id__in=mushroom_ids
+    ).select_related('lookalike').order_by('id')
+    for lookalike in lookalikes:
+        lookalikes_map.setdefault(lookalike.mushroom_id, []).append(lookalike)
+    return lookalikes_map
+
+def identifier_option_counts(request):
+    """Живые счётчики грибов по вариантам ответа для формы определителя (AJAX)"""
+    return JsonResponse(live_option_counts(get_selected_options(request.GET)))
+
 def find_matching_mushrooms(selected_options):
     """Находит грибы по выбранным характеристикам"""
-    from django.db.models import Q
-    
     # Если не выбрано ни одной характеристики - показываем все грибы
     if not selected_options:
         return Mushroom.objects.all()
     
-    # Начинаем с всех грибов
-    mushrooms = Mushroom.objects.all()
+    # Пересекаем битовые множества индекса вместо JOIN на каждый ответ
+    index = get_identifier_index()
+    matching_ids = index.ids_from_bits(index.match(selected_options))
     
-    # Для каждой выбранной характеристики добавляем фильтр
-    for char_id, option_value in selected_options.items():
-        # Ищем грибы, у которых есть связь с этой характеристикой и значением
-        mushrooms = mushrooms.filter(
-            mushroomcharacteristic__characteristic_id=char_id,
-            mushroomcharacteristic__option__value=option_value
-        )
-    
-    return mushrooms.distinct()
+    return Mushroom.objects.filter(id__in=matching_ids)
 
 def calculate_match_percentage(mushroom, selected_options):
     """Рассчитывает процент совпадения характеристик"""
-    # Если не выбрано ни одной характеристики - 100% совпадение
-    if not selected_options:
-        return 100
-    
-    total_selected = len(selected_options)
-    match_count = 0
-    
-    # Получаем все характеристики этого гриба
-    mushroom_chars = MushroomCharacteristic.objects.filter(mushroom=mushroom)
-    mushroom_char_dict = {
-        mc.characteristic_id: mc.option.value 
-        for mc in mushroom_chars
-    }
-    
-    # Считаем совпадения
-    for char_id, selected_value in selected_options.items():
-        if char_id in mushroom_char_dict:
-            if mushroom_char_dict[char_id] == selected_value:
-                match_count += 1
-    
-    return int((match_count / total_selected) * 100) if total_selected > 0 else 100
+    index = get_identifier_index()
+    pos = index.positions.get(mushroom.id)
+    if pos is None:
+        return match_percentage(0, len(selected_options))
+    
+    match_count = sum(
+        1 for char_id, selected_value in selected_options.items()
+        if index.bits_for(char_id, selected_value) >> pos & 1
+    )
+    return match_percentage(match_count, len(selected_options))
 
+@mushroom_condition
+@catalog_page_cache
 def mushroom_detail(request, mushroom_id):
     """Детальная страница гриба с информацией о двойниках"""
     mushroom = get_object_or_404(Mushroom, id=mushroom_id)
@@ -145,41 +326,53 @@ def mushroom_detail(request, mushroom_id):
         mushroom=mushroom
     ).select_related('characteristic', 'option')
     
-    # Находим похожие грибы (по типу и съедобности)
-    similar_mushrooms = Mushroom.objects.filter(
-        mushroom_type=mushroom.mushroom_type,
-        edibility=mushroom.edibility
-    ).exclude(id=mushroom.id)[:4]
+    # Похожие грибы рассчитаны заранее по характеристикам (build_similarity)
+    similarities = list(
+        mushroom.similarities.select_related('similar').prefetch_related('similar__photo_variants')
+    )
+    similar_mushrooms = [similarity.similar for similarity in similarities]
+    for similarity in similarities:
+        similarity.similar.similarity_percent = int(similarity.score * 100)
+    
+    # У гриба без характеристик похожих нет - показываем грибы того же типа и съедобности
+    if not similar_mushrooms:
+        similar_mushrooms = Mushroom.objects.filter(
+            mushroom_type=mushroom.mushroom_type,
+            edibility=mushroom.edibility
+        ).exclude(id=mushroom.id).prefetch_related('photo_variants')[:get_similar_count()]
     
     context = {
         'mushroom': mushroom,
         'lookalikes': lookalikes,
         'characteristics': characteristics,
         'similar_mushrooms': similar_mushrooms,
+        'districts': mushroom.districts.all(),
     }
     return render(request, 'mushroom_detail.html', context)
 
+@catalog_page_cache
 def search_mushrooms(request):
     """Поиск грибов по названию и характеристикам"""
-    query = request.GET.get('q', '')
-    
-    if query:
-        mushrooms = Mushroom.objects.filter(
-            Q(russian_name__icontains=query) |
-            Q(latin_name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(habitat__icontains=query)
-        )
-    else:
-        mushrooms = Mushroom.objects.none()
+    query = request.GET.get('q', '').strip()
+    
+    # Полнотекстовый индекс FTS5 с ранжированием BM25 (см. search.py)
+    mushrooms = search.search_mushrooms(query) if query else []
     
     context = {
         'mushrooms': mushrooms,
         'query': query,
-        'results_count': mushrooms.count()
+        'results_count': len(mushrooms)
     }
     return render(request, 'search_results.html', context)
 
+def autocomplete_mushrooms(request):
+    """Подсказки названий грибов для строки поиска (AJAX)"""
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    return JsonResponse({'results': autocomplete(request.GET.get('q', ''), limit)})
+
 # =============================================================================
 # ПРЕДСТАВЛЕНИЯ ДЛЯ КВИЗА
 # =============================================================================
@@ -542,6 +735,15 @@ def export_quiz_results(request):
     wb.save(response)
     return response
 
+@catalog_condition
+@catalog_page_cache
 def kingdom_info(request):
     """Страница с информацией о царстве грибов"""
-    return render(request, 'kingdom.html')
\ No newline at end of file
+    return render(request, 'kingdom.html')
+
+def media_file(request, path):
+    """Медиафайл; содержимое файла с хешем в имени не меняется, и браузер кэширует его навсегда"""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_addressed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response